@@ -12,52 +12,209 @@ This script compares annual GeoTIFF outputs to detect:
 import numpy as np
 import pandas as pd
 import rasterio
+from itertools import pairwise
 from pathlib import Path
-from rasterio.warp import calculate_default_transform, reproject, Resampling
 
+from raster_utils import iter_strips, reproject_window
 
-def load_and_align_rasters(year1_path, year2_path):
-    """Load two rasters and ensure they have matching extents/resolutions.
+try:
+    import numba
+except ImportError:  # numba is optional; change maps fall back to NumPy
+    numba = None
+
+
+def get_year_raster(year, results_dir, cache):
+    """Locate a year's GeoTIFF and read its grid, memoized across year pairs.
+
+    Every year except the first and last takes part in two consecutive pairs, so
+    the file lookup and header read happen once per year rather than per pair.
+
+    Args:
+        year: Year to look up
+        results_dir: Directory containing annual GeoTIFF results
+        cache: Dict of previously looked-up years, updated in place
+
+    Returns:
+        dict: Path, CRS, bounds, transform and shape of the raster, or None if
+            no GeoTIFF exists for the year
+    """
+    if year not in cache:
+        # Look for .tif files in the year's results directory
+        year_dir = Path(results_dir) / str(year)
+        year_files = list(year_dir.glob("*.tif")) + list(year_dir.glob("*.tiff"))
+
+        if not year_files:
+            cache[year] = None
+        else:
+            with rasterio.open(year_files[0]) as src:
+                cache[year] = {
+                    'path': year_files[0],
+                    'crs': src.crs,
+                    'bounds': src.bounds,
+                    'transform': src.transform,
+                    'shape': (src.height, src.width),
+                    'meta': src.meta,
+                }
+
+    return cache[year]
+
+
+def load_year_mask(year, raster, reference, threshold, mask_cache):
+    """Threshold a year's raster on a reference grid into a bit-packed mask.
+
+    The raster is streamed in row strips, each read directly or resampled onto
+    the reference grid when their CRS, transform or shape differ. Masks are cached per
+    (year, grid), so a year taking part in two consecutive pairs is decoded and
+    thresholded once whenever the yearly grids match.
+
+    Args:
+        year: Year of the raster
+        raster: Raster info from get_year_raster
+        reference: Raster info of the grid to align onto
+        threshold: Threshold for binary classification (0-255)
+        mask_cache: Dict of cached masks, updated in place
+
+    Returns:
+        np.ndarray: uint8 solar mask on the reference grid packed 8 pixels per
+            byte along each row (np.packbits with axis=1)
+    """
+    key = (year, reference['crs'], reference['transform'], reference['shape'])
+    if key in mask_cache:
+        return mask_cache[key]
+
+    print(f"  Loading: {raster['path'].name}")
+    height, width = reference['shape']
+    packed = np.empty((height, -(-width // 8)), dtype=np.uint8)
+
+    with rasterio.open(raster['path']) as src:
+        # Read directly only when on the same grid, as read_window_on_grid does;
+        # equal bounds alone could still differ in resolution
+        aligned = (raster['crs'] == reference['crs']
+                   and raster['transform'] == reference['transform']
+                   and raster['shape'] == reference['shape'])
+        if not aligned:
+            print(f"  ⚠ Reprojecting {raster['path'].name} to match {reference['path'].name}")
+
+        # Read, threshold and pack one strip at a time so neither the full
+        # uint8 raster nor a full-size bool mask is ever held in memory. Aligned
+        # strips and their thresholded masks reuse the same two buffers.
+        strip_rows = min(MASK_CHUNK_ROWS, height)
+        strip = np.empty((strip_rows, width), dtype=src.dtypes[0])
+        mask = np.empty((strip_rows, width), dtype=bool)
+        for window in iter_strips(height, width, MASK_CHUNK_ROWS):
+            if aligned:
+                data = src.read(1, window=window, out=strip[:window.height])
+            else:
+                data = reproject_window(src, window, reference['crs'], reference['transform'])
+            solar = np.greater(data, threshold, out=mask[:window.height])
+            packed[window.row_off:window.row_off + window.height] = \
+                np.packbits(solar, axis=1)
+
+    mask_cache[key] = packed
+    return packed
+
+
+# 2-bit change codes: bit 0 = solar in year1, bit 1 = solar in year2
+CODE_DECOMMISSIONED = 0b01
+CODE_NEW = 0b10
+CODE_PERSISTENT = 0b11
+
+# Maps change codes to the change map classes written to disk
+# (0 = no solar, 1 = new, 2 = decommissioned, 3 = persistent)
+CHANGE_CLASS_LUT = np.array([0, 2, 1, 3], dtype=np.uint8)
+
+# Rows read, thresholded or unpacked per strip, bounding full-width temporaries;
+# a multiple of the 512-pixel output block size so strips write whole blocks
+MASK_CHUNK_ROWS = 512
+
+# Set bits per byte value, for NumPy versions without np.bitwise_count
+POPCOUNT_LUT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(packed):
+    """Count the set bits of a packed uint8 array.
 
     Args:
-        year1_path: Path to first year GeoTIFF
-        year2_path: Path to second year GeoTIFF
+        packed: uint8 array of packed bits
 
     Returns:
-        tuple: (array1, array2, metadata) - Aligned rasters and metadata
+        int: Number of set bits
     """
-    with rasterio.open(year1_path) as src1, rasterio.open(year2_path) as src2:
-        # Read rasters
-        arr1 = src1.read(1)
-        arr2 = src2.read(1)
-
-        # Check if CRS and bounds match
-        if src1.crs != src2.crs or src1.bounds != src2.bounds:
-            print(f"  ⚠ Reprojecting {year2_path.name} to match {year1_path.name}")
-
-            # Reproject src2 to match src1
-            transform, width, height = calculate_default_transform(
-                src2.crs, src1.crs, src2.width, src2.height, *src2.bounds
-            )
-
-            arr2_aligned = np.empty((height, width), dtype=arr2.dtype)
-            reproject(
-                source=arr2,
-                destination=arr2_aligned,
-                src_transform=src2.transform,
-                src_crs=src2.crs,
-                dst_transform=transform,
-                dst_crs=src1.crs,
-                resampling=Resampling.nearest
-            )
-            arr2 = arr2_aligned
-
-        meta = src1.meta.copy()
-
-    return arr1, arr2, meta
-
-
-def detect_changes(year1, year2, results_dir, output_dir, threshold=128):
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(packed).sum(dtype=np.int64))
+    return int(POPCOUNT_LUT[packed].sum(dtype=np.int64))
+
+
+def count_change_codes(packed_year1, packed_year2, n_pixels):
+    """Count the pixels holding each 2-bit change code from packed masks.
+
+    Works on the packed words directly; packbits zero-pads each row, so the
+    padding bits never reach the new, decommissioned or persistent counts.
+
+    Args:
+        packed_year1: First year packed solar mask
+        packed_year2: Second year packed solar mask
+        n_pixels: Number of pixels in the unpacked grid
+
+    Returns:
+        list: Pixel count for each code, indexed by code
+    """
+    n_decommissioned = popcount(packed_year1 & ~packed_year2)
+    n_new = popcount(~packed_year1 & packed_year2)
+    n_persistent = popcount(packed_year1 & packed_year2)
+    n_none = n_pixels - n_decommissioned - n_new - n_persistent
+    return [n_none, n_decommissioned, n_new, n_persistent]
+
+
+def _expand_change_classes_numpy(packed_year1, packed_year2, out):
+    """NumPy implementation of _expand_change_classes."""
+    width = out.shape[1]
+    # Fold both years into one 2-bit code per pixel
+    codes = np.unpackbits(packed_year2, axis=1, count=width) << 1
+    codes |= np.unpackbits(packed_year1, axis=1, count=width)
+    np.take(CHANGE_CLASS_LUT, codes, out=out)
+
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _expand_change_classes(packed_year1, packed_year2, out):
+        """Write the change class of every pixel of two packed masks into out."""
+        for i in numba.prange(out.shape[0]):
+            for j in range(out.shape[1]):
+                shift = 7 - (j & 7)
+                code = ((packed_year1[i, j >> 3] >> shift) & 1) | \
+                    (((packed_year2[i, j >> 3] >> shift) & 1) << 1)
+                out[i, j] = CHANGE_CLASS_LUT[code]
+else:
+    _expand_change_classes = _expand_change_classes_numpy
+
+
+def write_change_map(packed_year1, packed_year2, meta, output_path):
+    """Write the change map of two aligned packed masks strip by strip.
+
+    Each strip of classes is expanded from the packed masks, by a compiled
+    kernel when numba is installed and by NumPy otherwise, and written straight
+    to its window, so the full-resolution change map never exists in memory.
+
+    Args:
+        packed_year1: First year packed solar mask
+        packed_year2: Second year packed solar mask, aligned with packed_year1
+        meta: Rasterio profile of the output GeoTIFF
+        output_path: Path of the output GeoTIFF
+    """
+    height, width = meta['height'], meta['width']
+    strip = np.empty((MASK_CHUNK_ROWS, width), dtype=np.uint8)
+
+    with rasterio.open(output_path, 'w', **meta) as dst:
+        for window in iter_strips(height, width, MASK_CHUNK_ROWS):
+            rows = slice(window.row_off, window.row_off + window.height)
+            out = strip[:window.height]
+            _expand_change_classes(packed_year1[rows], packed_year2[rows], out)
+            dst.write(out, 1, window=window)
+
+
+def detect_changes(year1, year2, results_dir, output_dir, threshold=128,
+                   raster_cache=None, mask_cache=None):
     """Detect changes in solar farm deployment between two years.
 
     Args:
@@ -66,6 +223,10 @@ def detect_changes(year1, year2, results_dir, output_dir, threshold=128):
         results_dir: Directory containing annual GeoTIFF results
         output_dir: Directory to save change detection outputs
         threshold: Threshold for binary classification (0-255)
+        raster_cache: Optional dict shared across calls so each year's GeoTIFF
+            is located and its header read only once
+        mask_cache: Optional dict shared across calls so thresholded masks are
+            reused by the next year pair. Masks of other years are evicted.
 
     Returns:
         dict: Statistics about detected changes
@@ -73,73 +234,68 @@ def detect_changes(year1, year2, results_dir, output_dir, threshold=128):
     print(f"\nAnalyzing changes: {year1} → {year2}")
     print("-" * 50)
 
+    if raster_cache is None:
+        raster_cache = {}
+    if mask_cache is None:
+        mask_cache = {}
+
+    # Only the masks of this pair can be reused by the next one
+    for key in [key for key in mask_cache if key[0] not in (year1, year2)]:
+        del mask_cache[key]
+
     # Find GeoTIFF files (handle various naming patterns)
     results_dir = Path(results_dir)
-    year1_dir = results_dir / str(year1)
-    year2_dir = results_dir / str(year2)
-
-    # Look for .tif files in results directories
-    year1_files = list(year1_dir.glob("*.tif")) + list(year1_dir.glob("*.tiff"))
-    year2_files = list(year2_dir.glob("*.tif")) + list(year2_dir.glob("*.tiff"))
+    try:
+        raster1 = get_year_raster(year1, results_dir, raster_cache)
+        raster2 = get_year_raster(year2, results_dir, raster_cache)
+    except Exception as e:
+        print(f"  ✗ Error loading rasters: {e}")
+        return None
 
-    if not year1_files:
-        print(f"  ✗ No GeoTIFF found for {year1} in {year1_dir}")
+    if raster1 is None:
+        print(f"  ✗ No GeoTIFF found for {year1} in {results_dir / str(year1)}")
         return None
-    if not year2_files:
-        print(f"  ✗ No GeoTIFF found for {year2} in {year2_dir}")
+    if raster2 is None:
+        print(f"  ✗ No GeoTIFF found for {year2} in {results_dir / str(year2)}")
         return None
 
-    year1_path = year1_files[0]
-    year2_path = year2_files[0]
-
-    print(f"  Loading: {year1_path.name}")
-    print(f"  Loading: {year2_path.name}")
-
-    # Load and align rasters
+    # Load both years on the first year's grid and threshold to binary
+    # (model outputs probabilities 0-255)
     try:
-        data_year1, data_year2, meta = load_and_align_rasters(year1_path, year2_path)
+        packed_year1 = load_year_mask(year1, raster1, raster1, threshold, mask_cache)
+        packed_year2 = load_year_mask(year2, raster2, raster1, threshold, mask_cache)
     except Exception as e:
         print(f"  ✗ Error loading rasters: {e}")
         return None
 
-    # Threshold to binary (model outputs probabilities 0-255)
-    binary_year1 = (data_year1 > threshold).astype(np.uint8)
-    binary_year2 = (data_year2 > threshold).astype(np.uint8)
-
-    # Detect changes
-    new_installations = (binary_year1 == 0) & (binary_year2 == 1)
-    decommissioned = (binary_year1 == 1) & (binary_year2 == 0)
-    persistent = (binary_year1 == 1) & (binary_year2 == 1)
+    height, width = raster1['shape']
+    counts = count_change_codes(packed_year1, packed_year2, height * width)
 
     # Calculate areas (10m resolution = 100m² per pixel)
     pixel_area_m2 = 100  # 10m × 10m
     pixel_area_km2 = pixel_area_m2 / 1_000_000  # Convert to km²
 
-    new_area_km2 = np.sum(new_installations) * pixel_area_km2
-    decom_area_km2 = np.sum(decommissioned) * pixel_area_km2
-    persistent_area_km2 = np.sum(persistent) * pixel_area_km2
-    total_year1_km2 = np.sum(binary_year1) * pixel_area_km2
-    total_year2_km2 = np.sum(binary_year2) * pixel_area_km2
+    new_area_km2 = counts[CODE_NEW] * pixel_area_km2
+    decom_area_km2 = counts[CODE_DECOMMISSIONED] * pixel_area_km2
+    persistent_area_km2 = counts[CODE_PERSISTENT] * pixel_area_km2
+    total_year1_km2 = (counts[CODE_DECOMMISSIONED] + counts[CODE_PERSISTENT]) * pixel_area_km2
+    total_year2_km2 = (counts[CODE_NEW] + counts[CODE_PERSISTENT]) * pixel_area_km2
 
     # Calculate growth metrics
     net_change_km2 = total_year2_km2 - total_year1_km2
     growth_rate_pct = (net_change_km2 / total_year1_km2 * 100) if total_year1_km2 > 0 else 0
 
-    # Create change map
-    # 0 = no solar, 1 = new, 2 = decommissioned, 3 = persistent
-    change_map = np.zeros_like(data_year1, dtype=np.uint8)
-    change_map[new_installations] = 1
-    change_map[decommissioned] = 2
-    change_map[persistent] = 3
-
     # Save change detection raster
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     output_path = output_dir / f"changes_{year1}_to_{year2}.tif"
 
-    meta.update(dtype=rasterio.uint8, count=1, compress='lzw')
-    with rasterio.open(output_path, 'w', **meta) as dst:
-        dst.write(change_map, 1)
+    # Tiled so downstream tools can read windows; the mostly-zero class map
+    # compresses far better with the horizontal differencing predictor
+    meta = raster1['meta'].copy()
+    meta.update(dtype=rasterio.uint8, count=1, compress='lzw', predictor=2,
+                tiled=True, blockxsize=512, blockysize=512, BIGTIFF='IF_SAFER')
+    write_change_map(packed_year1, packed_year2, meta, output_path)
 
     # Print statistics
     print(f"\n  Results:")
@@ -180,12 +336,12 @@ def main():
     # Run year-over-year analysis
     years = range(2017, 2026)
     stats = []
+    raster_cache = {}
+    mask_cache = {}
 
-    for i in range(len(list(years)) - 1):
-        year1 = 2017 + i
-        year2 = year1 + 1
-
-        result = detect_changes(year1, year2, results_dir, output_dir)
+    for year1, year2 in pairwise(years):
+        result = detect_changes(year1, year2, results_dir, output_dir,
+                                raster_cache=raster_cache, mask_cache=mask_cache)
         if result:
             stats.append(result)
 
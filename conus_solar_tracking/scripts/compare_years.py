@@ -8,57 +8,107 @@ Generates side-by-side comparisons, temporal animations, and change visualizatio
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
-from matplotlib.colors import ListedColormap, LinearSegmentedColormap
+from matplotlib.colors import LinearSegmentedColormap
 import rasterio
-from rasterio.warp import reproject, Resampling, calculate_default_transform
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import pairwise, repeat
 from pathlib import Path
 import argparse
 
+from raster_utils import (BINARY_RGBA, block_max, display_stride, downsample_max,
+                          iter_strips, read_window_on_grid, reproject_to_grid,
+                          save_pdf_from_png)
+
+
+# Width/height of one map panel in inches; rasters are downsampled to this
+# many inches times the DPI before plotting
+PANEL_SIZE_IN = 6
+
+# Approximate rows per strip when streaming rasters for statistics
+STRIP_ROWS = 512
+
+# RGBA colors indexed by change class, applied like raster_utils.BINARY_RGBA
+# 0=no solar (white), 1=persistent (gold), 2=new (green), 3=decommissioned (red)
+CHANGE_RGBA = np.array([[255, 255, 255, 255],
+                        [255, 215, 0, 255],
+                        [0, 255, 0, 255],
+                        [255, 0, 0, 255]], dtype=np.uint8)
+
+# 3-panel change figure shared by consecutive create_change_visualization calls
+_change_figure = None
+
+
+def get_change_figure(dpi):
+    """Return the 3-panel change figure, cleared for reuse.
+
+    Creating a figure and its Agg canvas for every year pair costs more than
+    drawing the downsampled panels, so one figure is kept and its axes cleared
+    between calls.
+
+    Args:
+        dpi: Figure resolution
+
+    Returns:
+        tuple: (figure, array of 3 axes)
+    """
+    global _change_figure
+    if _change_figure is None or _change_figure[0].dpi != dpi:
+        if _change_figure is not None:
+            plt.close(_change_figure[0])
+        _change_figure = plt.subplots(1, 3, figsize=(20, 6), dpi=dpi)
+    else:
+        for ax in _change_figure[1]:
+            ax.clear()
+    return _change_figure
+
+
+def read_on_grid(path, ref_crs, ref_transform, ref_shape):
+    """Read band 1 of a raster on the reference grid.
+
+    Rasters whose CRS or grid differ from the reference are reprojected onto
+    it tile by tile, without reading the source raster in full.
+
+    Args:
+        path: Path to GeoTIFF file
+        ref_crs: CRS of the reference grid
+        ref_transform: Affine transform of the reference grid
+        ref_shape: (height, width) of the reference grid
+
+    Returns:
+        np.ndarray: Band 1 on the reference grid
+    """
+    with rasterio.open(path) as src:
+        if (src.crs == ref_crs and src.transform == ref_transform
+                and (src.height, src.width) == tuple(ref_shape)):
+            return src.read(1)
+        return reproject_to_grid(src, ref_crs, ref_transform, ref_shape)
+
 
 def load_and_align_rasters(*paths):
     """Load multiple rasters and align them to the same grid.
 
+    The first raster defines the grid. All rasters are read concurrently in a
+    thread pool; GDAL releases the GIL while decoding and warping, so the reads
+    overlap instead of running one after another.
+
     Args:
         *paths: Paths to GeoTIFF files
 
     Returns:
         tuple: (list of arrays, metadata, bounds)
     """
-    # Load first raster as reference
+    # Only the reference header is needed before the reads can start
     with rasterio.open(paths[0]) as src:
-        ref_data = src.read(1)
         ref_meta = src.meta.copy()
         ref_bounds = src.bounds
-        ref_transform = src.transform
-        ref_crs = src.crs
-
-    aligned_arrays = [ref_data]
-
-    # Align other rasters to reference
-    for path in paths[1:]:
-        with rasterio.open(path) as src:
-            data = src.read(1)
-
-            # Check if alignment needed
-            if src.crs != ref_crs or src.bounds != ref_bounds:
-                # Reproject to match reference
-                transform, width, height = calculate_default_transform(
-                    src.crs, ref_crs, src.width, src.height, *src.bounds
-                )
-
-                aligned = np.empty((ref_data.shape[0], ref_data.shape[1]), dtype=data.dtype)
-                reproject(
-                    source=data,
-                    destination=aligned,
-                    src_transform=src.transform,
-                    src_crs=src.crs,
-                    dst_transform=ref_transform,
-                    dst_crs=ref_crs,
-                    resampling=Resampling.nearest
-                )
-                aligned_arrays.append(aligned)
-            else:
-                aligned_arrays.append(data)
+    ref_shape = (ref_meta['height'], ref_meta['width'])
+
+    with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+        aligned_arrays = list(executor.map(
+            read_on_grid, paths,
+            repeat(ref_meta['crs']), repeat(ref_meta['transform']), repeat(ref_shape)
+        ))
 
     return aligned_arrays, ref_meta, ref_bounds
 
@@ -75,34 +125,50 @@ def create_side_by_side_comparison(geotiff_paths, years, output_path, threshold=
     """
     print(f"\nCreating side-by-side comparison for {len(years)} years...")
 
-    # Load and align all rasters
-    arrays, meta, bounds = load_and_align_rasters(*geotiff_paths)
-
-    # Convert to binary
-    binary_arrays = [(arr > threshold).astype(np.uint8) for arr in arrays]
+    # The first raster defines the grid every year is aligned to
+    with rasterio.open(geotiff_paths[0]) as src:
+        meta = src.meta.copy()
+        bounds = src.bounds
+    height, width = meta['height'], meta['width']
+    n_years = len(geotiff_paths)
+
+    # Stream all years in row strips on the reference grid, counting detections
+    # at full resolution and keeping only the block-max panels for display.
+    # Strips span whole display blocks so blocks never straddle two strips.
+    stride = display_stride((height, width), PANEL_SIZE_IN * dpi)
+    strip_rows = stride * -(-STRIP_ROWS // stride)
+    counts = np.zeros(n_years, dtype=np.int64)
+    panels = np.empty((n_years, -(-height // stride), -(-width // stride)), dtype=bool)
+    strip = np.empty((n_years, strip_rows, width), dtype=bool)
+
+    with ExitStack() as stack:
+        sources = [stack.enter_context(rasterio.open(path)) for path in geotiff_paths]
+        for window in iter_strips(height, width, strip_rows):
+            binary = strip[:, :window.height]
+            for src, out in zip(sources, binary):
+                data = read_window_on_grid(src, window, meta['crs'], meta['transform'],
+                                           (height, width))
+                np.greater(data, threshold, out=out)
+            counts += np.count_nonzero(binary, axis=(1, 2))
+            row = window.row_off // stride
+            panels[:, row:row + -(-window.height // stride)] = block_max(binary, stride)
 
     # Calculate statistics for each year
     pixel_size = abs(meta['transform'].a)
-    stats = []
-    for arr in binary_arrays:
-        total_pixels = np.sum(arr)
-        area_km2 = total_pixels * pixel_size * pixel_size / 1_000_000
-        stats.append(area_km2)
+    stats = counts * pixel_size * pixel_size / 1_000_000
 
     # Create figure
-    n_years = len(years)
-    fig, axes = plt.subplots(1, n_years, figsize=(6*n_years, 6), dpi=dpi)
+    fig, axes = plt.subplots(1, n_years, figsize=(PANEL_SIZE_IN*n_years, PANEL_SIZE_IN),
+                             dpi=dpi)
 
     if n_years == 1:
         axes = [axes]
 
-    # Colormap
-    cmap = ListedColormap(['white', '#FF6B35'])
-
-    for idx, (ax, binary, year, area) in enumerate(zip(axes, binary_arrays, years, stats)):
+    for idx, (ax, panel, year, area) in enumerate(zip(axes, panels, years, stats)):
         # Plot
-        ax.imshow(binary, cmap=cmap, interpolation='nearest',
-                 extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
+        ax.imshow(BINARY_RGBA[panel.view(np.uint8)],
+                  interpolation='nearest',
+                  extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
 
         # Title with statistics
         ax.set_title(f'{year}\n{area:.2f} km²', fontsize=14, fontweight='bold')
@@ -145,14 +211,14 @@ def create_change_visualization(geotiff_path1, geotiff_path2, year1, year2,
     data1, data2 = arrays
 
     # Binary classification
-    binary1 = (data1 > threshold).astype(np.uint8)
-    binary2 = (data2 > threshold).astype(np.uint8)
+    binary1 = data1 > threshold
+    binary2 = data2 > threshold
 
     # Detect changes
-    new_installations = (binary1 == 0) & (binary2 == 1)
-    decommissioned = (binary1 == 1) & (binary2 == 0)
-    persistent = (binary1 == 1) & (binary2 == 1)
-    no_solar = (binary1 == 0) & (binary2 == 0)
+    new_installations = ~binary1 & binary2
+    decommissioned = binary1 & ~binary2
+    persistent = binary1 & binary2
+    no_solar = ~binary1 & ~binary2
 
     # Create change map
     # 0=no solar, 1=persistent, 2=new, 3=decommissioned
@@ -165,19 +231,24 @@ def create_change_visualization(geotiff_path1, geotiff_path2, year1, year2,
     pixel_size = abs(meta['transform'].a)
     pixel_area_km2 = pixel_size * pixel_size / 1_000_000
 
-    area1 = np.sum(binary1) * pixel_area_km2
-    area2 = np.sum(binary2) * pixel_area_km2
-    new_area = np.sum(new_installations) * pixel_area_km2
-    decom_area = np.sum(decommissioned) * pixel_area_km2
-    persistent_area = np.sum(persistent) * pixel_area_km2
+    area1 = np.count_nonzero(binary1) * pixel_area_km2
+    area2 = np.count_nonzero(binary2) * pixel_area_km2
+    new_area = np.count_nonzero(new_installations) * pixel_area_km2
+    decom_area = np.count_nonzero(decommissioned) * pixel_area_km2
+    persistent_area = np.count_nonzero(persistent) * pixel_area_km2
+
+    # Downsample to the panel resolution for display; statistics above use the
+    # full-resolution arrays. The change map keeps the highest code per block.
+    max_size = PANEL_SIZE_IN * dpi
+    binary1 = downsample_max(binary1, max_size)
+    binary2 = downsample_max(binary2, max_size)
+    change_map = downsample_max(change_map, max_size)
 
-    # Create 3-panel figure
-    fig = plt.figure(figsize=(20, 6), dpi=dpi)
+    # Reuse the 3-panel figure from the previous pair if there is one
+    fig, (ax1, ax2, ax3) = get_change_figure(dpi)
 
     # Panel 1: Year 1
-    ax1 = plt.subplot(1, 3, 1)
-    cmap_binary = ListedColormap(['white', '#FF6B35'])
-    ax1.imshow(binary1, cmap=cmap_binary, interpolation='nearest',
+    ax1.imshow(BINARY_RGBA[binary1.view(np.uint8)], interpolation='nearest',
               extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
     ax1.set_title(f'{year1}\nTotal: {area1:.2f} km²',
                  fontsize=14, fontweight='bold')
@@ -186,8 +257,7 @@ def create_change_visualization(geotiff_path1, geotiff_path2, year1, year2,
     ax1.grid(True, alpha=0.3)
 
     # Panel 2: Year 2
-    ax2 = plt.subplot(1, 3, 2)
-    ax2.imshow(binary2, cmap=cmap_binary, interpolation='nearest',
+    ax2.imshow(BINARY_RGBA[binary2.view(np.uint8)], interpolation='nearest',
               extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
     ax2.set_title(f'{year2}\nTotal: {area2:.2f} km²',
                  fontsize=14, fontweight='bold')
@@ -196,10 +266,7 @@ def create_change_visualization(geotiff_path1, geotiff_path2, year1, year2,
     ax2.grid(True, alpha=0.3)
 
     # Panel 3: Change detection
-    ax3 = plt.subplot(1, 3, 3)
-    cmap_change = ListedColormap(['white', '#FFD700', '#00FF00', '#FF0000'])
-    # 0=no solar (white), 1=persistent (gold), 2=new (green), 3=decommissioned (red)
-    im3 = ax3.imshow(change_map, cmap=cmap_change, interpolation='nearest',
+    im3 = ax3.imshow(CHANGE_RGBA[change_map], interpolation='nearest',
                      extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
     ax3.set_title(f'Change Detection\nNet: {(area2-area1):+.2f} km²',
                  fontsize=14, fontweight='bold')
@@ -227,17 +294,15 @@ def create_change_visualization(geotiff_path1, geotiff_path2, year1, year2,
                 f'(Net Change: {net_change:+.2f} km², {growth_pct:+.1f}%)',
                 fontsize=16, fontweight='bold', y=0.98)
 
-    plt.tight_layout(rect=[0, 0, 1, 0.96])
-    plt.savefig(output_path, dpi=dpi, bbox_inches='tight', facecolor='white')
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+    fig.savefig(output_path, dpi=dpi, bbox_inches='tight', facecolor='white')
     print(f"  ✓ Saved: {output_path}")
 
-    # Also save as PDF
+    # Also save as PDF, reusing the rendered PNG rather than re-rendering
     pdf_path = output_path.with_suffix('.pdf')
-    plt.savefig(pdf_path, bbox_inches='tight', facecolor='white')
+    save_pdf_from_png(output_path, pdf_path, dpi)
     print(f"  ✓ Saved: {pdf_path}")
 
-    plt.close()
-
 
 def main():
     """Main function for comparison visualizations."""
@@ -286,11 +351,12 @@ def main():
         create_side_by_side_comparison(geotiff_paths, years, output_path,
                                       args.threshold, args.dpi)
 
-    elif args.mode == 'change' and len(geotiff_paths) == 2:
-        output_path = output_dir / f"change_{years[0]}_to_{years[1]}.png"
-        create_change_visualization(geotiff_paths[0], geotiff_paths[1],
-                                   years[0], years[1], output_path,
-                                   args.threshold, args.dpi)
+    elif args.mode == 'change':
+        # One change figure per consecutive pair of files
+        for (path1, year1), (path2, year2) in pairwise(zip(geotiff_paths, years)):
+            output_path = output_dir / f"change_{year1}_to_{year2}.png"
+            create_change_visualization(path1, path2, year1, year2, output_path,
+                                       args.threshold, args.dpi)
 
     print("\n" + "="*70)
     print("  ✓ Comparison complete!")
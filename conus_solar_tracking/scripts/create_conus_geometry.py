@@ -10,17 +10,34 @@ import json
 from pathlib import Path
 
 
+# CONUS bounding box (covers continental United States)
+WEST, SOUTH = -125.0, 24.0
+EAST, NORTH = -66.0, 49.5
+
+# The polygon is the same every year, so it is serialized once
+CONUS_POLYGON_JSON = json.dumps({
+    "type": "Polygon",
+    "coordinates": [[
+        [WEST, SOUTH],
+        [WEST, NORTH],
+        [EAST, NORTH],
+        [EAST, SOUTH],
+        [WEST, SOUTH]
+    ]]
+}, separators=(',', ':'))
+
+
 def create_conus_geojson(year, output_path):
     """Create CONUS bounding box GeoJSON for a specific year.
 
+    Only the temporal properties depend on the year, so they are substituted
+    into a compact template around the pre-serialized polygon rather than
+    encoding the whole FeatureCollection each time.
+
     Args:
         year: Year for the prediction (2017-2025)
         output_path: Path where GeoJSON file will be saved
     """
-    # CONUS bounding box (covers continental United States)
-    west, south = -125.0, 24.0
-    east, north = -66.0, 49.5
-
     # Use summer months (June-September) for best imagery quality
     # - Maximum clear sky conditions
     # - Consistent sun angles
@@ -28,37 +45,20 @@ def create_conus_geojson(year, output_path):
     start_date = f"{year}-06-01T00:00:00Z"
     end_date = f"{year}-09-01T00:00:00Z"
 
-    geojson = {
-        "type": "FeatureCollection",
-        "features": [{
-            "type": "Feature",
-            "geometry": {
-                "type": "Polygon",
-                "coordinates": [[
-                    [west, south],
-                    [west, north],
-                    [east, north],
-                    [east, south],
-                    [west, south]
-                ]]
-            },
-            "properties": {
-                "oe_start_time": start_date,
-                "oe_end_time": end_date,
-                "year": year,
-                "region": "CONUS",
-                "description": f"Continental US solar farm detection for {year}"
-            }
-        }]
-    }
+    geojson = (
+        '{"type":"FeatureCollection","features":[{"type":"Feature",'
+        f'"geometry":{CONUS_POLYGON_JSON},'
+        f'"properties":{{"oe_start_time":"{start_date}","oe_end_time":"{end_date}",'
+        f'"year":{year},"region":"CONUS",'
+        f'"description":"Continental US solar farm detection for {year}"}}}}]}}'
+    )
 
     # Ensure output directory exists
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Write GeoJSON file
-    with open(output_path, 'w') as f:
-        json.dump(geojson, f, indent=2)
+    output_path.write_text(geojson)
 
     print(f"✓ Created {output_path}")
 
@@ -0,0 +1,248 @@
+"""
+Shared raster helpers for the CONUS solar tracking scripts.
+
+Imported by the analysis and visualization scripts in this directory, which
+are run directly (``python scripts/<name>.py``) so this module is on sys.path.
+"""
+
+import numpy as np
+import rasterio
+from PIL import Image
+from rasterio.warp import reproject, Resampling
+from rasterio.windows import Window
+from rasterio.windows import transform as window_transform
+
+
+# Edge length (pixels) of the destination tiles used when warping onto a grid
+REPROJECT_TILE_SIZE = 2048
+
+# Decimation factors of the overview pyramid added to yearly results
+OVERVIEW_FACTORS = [2, 4, 8, 16, 32, 64, 128, 256]
+
+# GDAL options for reading the large compressed results: decode blocks on all
+# cores and keep a larger block cache (in MB) than GDAL's default 5% of RAM
+GDAL_READ_OPTIONS = {'GDAL_NUM_THREADS': 'ALL_CPUS', 'GDAL_CACHEMAX': 1024}
+
+# RGBA colors of a detection mask, applied with a NumPy gather on its uint8
+# view so imshow draws the image as-is instead of normalizing it through a
+# colormap: 0=no solar (white), 1=solar (orange)
+BINARY_RGBA = np.array([[255, 255, 255, 255],
+                        [255, 107, 53, 255]], dtype=np.uint8)
+
+
+def iter_tiles(height, width, tile_size):
+    """Yield windows covering a (height, width) grid in row-major tiles.
+
+    Args:
+        height: Grid height in pixels
+        width: Grid width in pixels
+        tile_size: Maximum tile edge length in pixels
+
+    Yields:
+        Window: Tile window; edge tiles are clipped to the grid
+    """
+    for row in range(0, height, tile_size):
+        for col in range(0, width, tile_size):
+            yield Window(col, row,
+                         min(tile_size, width - col),
+                         min(tile_size, height - row))
+
+
+def iter_strips(height, width, strip_rows):
+    """Yield full-width windows covering a (height, width) grid top to bottom.
+
+    Args:
+        height: Grid height in pixels
+        width: Grid width in pixels
+        strip_rows: Maximum rows per strip
+
+    Yields:
+        Window: Strip window; the last strip is clipped to the grid
+    """
+    for row in range(0, height, strip_rows):
+        yield Window(0, row, width, min(strip_rows, height - row))
+
+
+def reproject_window(src, window, dst_crs, dst_transform):
+    """Reproject band 1 of an open dataset onto one window of a reference grid.
+
+    The window is warped directly from the source band, so GDAL only reads the
+    source blocks overlapping it.
+
+    Args:
+        src: Open rasterio dataset to reproject
+        window: Window of the reference grid to fill
+        dst_crs: CRS of the reference grid
+        dst_transform: Affine transform of the reference grid
+
+    Returns:
+        np.ndarray: Band 1 of src resampled onto the window
+    """
+    tile = np.zeros((window.height, window.width), dtype=src.dtypes[0])
+    reproject(
+        source=rasterio.band(src, 1),
+        destination=tile,
+        src_transform=src.transform,
+        src_crs=src.crs,
+        dst_transform=window_transform(window, dst_transform),
+        dst_crs=dst_crs,
+        resampling=Resampling.nearest
+    )
+    return tile
+
+
+def read_window_on_grid(src, window, dst_crs, dst_transform, dst_shape):
+    """Read band 1 of an open dataset for one window of a reference grid.
+
+    Args:
+        src: Open rasterio dataset
+        window: Window of the reference grid to read
+        dst_crs: CRS of the reference grid
+        dst_transform: Affine transform of the reference grid
+        dst_shape: (height, width) of the reference grid
+
+    Returns:
+        np.ndarray: Band 1 of src on the window, read directly when src is on
+            the reference grid and reprojected otherwise
+    """
+    if (src.crs == dst_crs and src.transform == dst_transform
+            and (src.height, src.width) == tuple(dst_shape)):
+        return src.read(1, window=window)
+    return reproject_window(src, window, dst_crs, dst_transform)
+
+
+def reproject_to_grid(src, dst_crs, dst_transform, dst_shape,
+                      tile_size=REPROJECT_TILE_SIZE):
+    """Reproject band 1 of an open dataset onto a reference grid tile by tile.
+
+    Args:
+        src: Open rasterio dataset to reproject
+        dst_crs: CRS of the reference grid
+        dst_transform: Affine transform of the reference grid
+        dst_shape: (height, width) of the reference grid
+        tile_size: Edge length of the destination tiles in pixels
+
+    Returns:
+        np.ndarray: Band 1 of src resampled onto the reference grid
+    """
+    height, width = dst_shape
+    aligned = np.zeros((height, width), dtype=src.dtypes[0])
+
+    for window in iter_tiles(height, width, tile_size):
+        aligned[window.row_off:window.row_off + window.height,
+                window.col_off:window.col_off + window.width] = \
+            reproject_window(src, window, dst_crs, dst_transform)
+
+    return aligned
+
+
+def display_stride(shape, max_size):
+    """Return the block size that fits a raster within max_size pixels a side.
+
+    Args:
+        shape: (height, width) of the raster
+        max_size: Maximum number of rows and columns to keep
+
+    Returns:
+        int: Downsampling factor, at least 1
+    """
+    return max(1, -(-shape[0] // max_size), -(-shape[1] // max_size))
+
+
+def block_max(arr, stride):
+    """Downsample the last two axes of an array by the max of each block.
+
+    Args:
+        arr: Integer or boolean array with at least two dimensions
+        stride: Block edge length in pixels
+
+    Returns:
+        np.ndarray: Block maxima; edge blocks may be partial
+    """
+    if stride == 1:
+        return arr
+    rows = np.maximum.reduceat(arr, np.arange(0, arr.shape[-2], stride), axis=-2)
+    return np.maximum.reduceat(rows, np.arange(0, arr.shape[-1], stride), axis=-1)
+
+
+def block_counts(mask, stride, row_off=0):
+    """Count the set pixels of a boolean mask in each block of a square grid.
+
+    The mask may be a strip of a larger mask starting at row row_off, in which
+    case its rows are grouped by the blocks of the larger mask: a block split
+    across two strips gets a partial count from each. Edge blocks may be
+    partial. Columns are summed first, while the data is still contiguous, into
+    uint32 counts.
+
+    Args:
+        mask: Boolean array with at least two dimensions
+        stride: Block edge length in pixels, at most 65535
+        row_off: Row of the larger mask that the first row of mask is
+
+    Returns:
+        np.ndarray: uint32 count of set pixels in each block the mask overlaps
+    """
+    col_starts = np.arange(0, mask.shape[-1], stride)
+    counts = np.add.reduceat(mask.view(np.uint8), col_starts, axis=-1, dtype=np.uint32)
+    # Rows of mask where a block starts, with the first row starting the first
+    row_starts = np.arange(-(row_off % stride), mask.shape[-2], stride)
+    row_starts[0] = 0
+    return np.add.reduceat(counts, row_starts, axis=-2)
+
+
+def downsample_max(arr, max_size):
+    """Downsample a class raster for display by taking the max of each block.
+
+    Matplotlib resamples any image to the figure resolution, so drawing a
+    full-resolution raster only adds work. Taking the block max (rather than a
+    strided sample) keeps isolated non-zero pixels, such as a single new
+    installation, visible after downsampling.
+
+    Args:
+        arr: 2D integer or boolean raster
+        max_size: Maximum number of rows and columns to keep
+
+    Returns:
+        np.ndarray: Downsampled raster, or arr itself if it already fits
+    """
+    return block_max(arr, display_stride(arr.shape, max_size))
+
+
+def build_overviews(path, factors=OVERVIEW_FACTORS):
+    """Add an internal overview pyramid to a GeoTIFF in place.
+
+    With overviews, GIS viewers and reads with a reduced out_shape are served
+    from the matching pyramid level instead of decimating the full raster.
+
+    Args:
+        path: Path of the GeoTIFF to update
+        factors: Decimation factors of the overview levels
+    """
+    with rasterio.open(path, 'r+') as dst:
+        dst.build_overviews(factors, Resampling.average)
+        dst.update_tags(ns='rio_overview', resampling='average')
+
+
+def save_pdf_from_png(png_path, pdf_path, dpi):
+    """Wrap an already-rendered PNG figure in a single-page PDF.
+
+    Saving a Matplotlib figure a second time as PDF resamples every image
+    artist again; embedding the PNG instead costs one encode. The PNG is placed
+    unscaled on a page of its size at dpi, which Matplotlib's PDF backend
+    embeds with lossless Flate compression (Pillow's PDF writer would encode
+    it as JPEG).
+
+    Args:
+        png_path: Path of the rendered PNG
+        pdf_path: Path of the PDF to write
+        dpi: Resolution the PNG was rendered at, used for the PDF page size
+    """
+    # Only the plotting scripts call this, so the others skip the import
+    from matplotlib.figure import Figure
+
+    with Image.open(png_path) as image:
+        pixels = np.asarray(image.convert('RGB'))
+    height, width = pixels.shape[:2]
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    fig.figimage(pixels, resize=False)
+    fig.savefig(pdf_path, dpi=dpi)
@@ -1,29 +1,69 @@
 #!/usr/bin/env python3
 """
-Run solar farm inference for all years (2017-2025) sequentially.
+Run solar farm inference for all years (2017-2025).
 
 This script runs the OlmoEarth inference pipeline for each year, processing
-the entire continental US and generating GeoTIFF outputs for each year.
+the entire continental US and generating GeoTIFF outputs for each year. Years
+run sequentially by default; pass --workers to run several years at once, each
+pinned to one of --gpus devices.
+
+Inference runs in this process rather than through `python -m
+olmoearth_projects.main`, so with one worker interpreter startup and the
+torch/rslearn imports happen once per run instead of once per year. With more
+workers, each year runs in a freshly spawned worker process so that it can be
+pinned to a GPU, which repeats the startup and imports for every year. Either
+way the checkpoint is downloaded once per run. Years run from the repository
+root, as the per-year `olmoearth_projects.main` commands did, so relative paths
+in the project configs resolve the same way.
 """
 
-import subprocess
+import argparse
+import os
+import shutil
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 
+import dotenv
+from upath import UPath
+
+from olmoearth_projects.olmoearth_run.olmoearth_run import get_local_checkpoint, olmoearth_run
+from olmoearth_projects.utils.mp import init_mp
+from raster_utils import build_overviews
+
 
 # Model checkpoint location
 CHECKPOINT = "gs://ai2-rslearn-projects-data/projects/2025_11_05_satlas_solar_farm/2025_11_05_model_update/epoch=9999-step=99999.ckpt"
 
 
-def run_year(year, base_dir, conus_base, checkpoint_path):
+def copy_results(result_src, result_dst):
+    """Copy the contents of a results directory into permanent storage.
+
+    shutil.copy2 uses the kernel's zero-copy path (sendfile) on Linux, so the
+    multi-GB GeoTIFFs are not streamed through user space.
+
+    Args:
+        result_src: Directory containing the inference results
+        result_dst: Directory to copy the results into
+    """
+    result_dst.mkdir(parents=True, exist_ok=True)
+    for entry in result_src.iterdir():
+        if entry.is_dir():
+            shutil.copytree(entry, result_dst / entry.name, dirs_exist_ok=True)
+        else:
+            shutil.copy2(entry, result_dst / entry.name)
+
+
+def run_year(year, conus_base, checkpoint_path, gpu=None):
     """Run inference for a single year.
 
     Args:
         year: Year to process (2017-2025)
-        base_dir: Base olmoearth_projects directory
         conus_base: CONUS solar tracking directory
-        checkpoint_path: Path to model checkpoint
+        checkpoint_path: Local path to the model checkpoint
+        gpu: Optional GPU index to pin the inference to. Only takes effect in a
+            fresh worker process, before CUDA has been initialized.
 
     Returns:
         bool: True if successful, False otherwise
@@ -41,19 +81,14 @@ def run_year(year, base_dir, conus_base, checkpoint_path):
     print(f"  Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*70}\n")
 
-    # Build command
-    cmd = [
-        "python", "-m", "olmoearth_projects.main",
-        "olmoearth_run", "olmoearth_run",
-        "--config_path", str(config_path),
-        "--checkpoint_path", checkpoint_path,
-        "--scratch_path", str(scratch_path)
-    ]
+    if gpu is not None:
+        os.environ["CUDA_VISIBLE_DEVICES"] = str(gpu)
 
     try:
         # Run inference
         start_time = datetime.now()
-        subprocess.run(cmd, check=True, cwd=base_dir)
+        olmoearth_run(config_path=config_path, scratch_path=scratch_path,
+                      checkpoint_path=checkpoint_path)
         end_time = datetime.now()
         duration = end_time - start_time
 
@@ -67,41 +102,94 @@ def run_year(year, base_dir, conus_base, checkpoint_path):
         result_src = scratch_path / "results/results_raster"
         if result_src.exists():
             print(f"Copying results to {result_dst}...")
-            subprocess.run(["cp", "-r", str(result_src / "*"), str(result_dst)],
-                          shell=True, check=False)
-            print(f"✓ Results copied to {result_dst}\n")
+            copy_results(result_src, result_dst)
+            print(f"✓ Results copied to {result_dst}")
+
+            # Pyramids let viewers and reduced-resolution reads skip the full raster
+            for geotiff in result_dst.rglob("*.tif"):
+                build_overviews(geotiff)
+            print(f"✓ Overviews built for {result_dst}\n")
         else:
             print(f"⚠ Warning: No results found at {result_src}\n")
 
         return True
 
-    except subprocess.CalledProcessError as e:
+    except Exception as e:
         print(f"\n{'='*70}")
         print(f"  ✗ Error processing {year}")
-        print(f"  Error code: {e.returncode}")
+        print(f"  Error: {e!r}")
         print(f"{'='*70}\n")
         print("To resume from this year, re-run this script.")
         print("The pipeline supports stage-based recovery.")
         return False
 
 
+def run_years(years, conus_base, checkpoint_path, workers=1, gpus=1):
+    """Run inference for several years, optionally in parallel.
+
+    With one worker years run in order in this process and stop at the first
+    failure. With more workers, each year runs in its own fresh worker process
+    so it can be pinned to a GPU; years are spread round-robin over the GPUs and
+    years still waiting in the pool are cancelled once one fails.
+
+    Args:
+        years: Years to process, in order
+        conus_base: CONUS solar tracking directory
+        checkpoint_path: Local path to the model checkpoint
+        workers: Number of years to run concurrently
+        gpus: Number of GPUs to distribute concurrent years over
+
+    Returns:
+        tuple: (completed_years, failed_year) - failed_year is the earliest year
+            that failed, or None if all years succeeded
+    """
+    if workers <= 1:
+        completed_years = []
+        for year in years:
+            if not run_year(year, conus_base, checkpoint_path):
+                return completed_years, year
+            completed_years.append(year)
+        return completed_years, None
+
+    completed_years = []
+    failed_years = []
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as executor:
+        futures = {
+            executor.submit(run_year, year, conus_base, checkpoint_path,
+                            idx % gpus): year
+            for idx, year in enumerate(years)
+        }
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            year = futures[future]
+            if future.result():
+                completed_years.append(year)
+            else:
+                failed_years.append(year)
+                for pending in futures:
+                    pending.cancel()
+
+    return sorted(completed_years), min(failed_years, default=None)
+
+
 def main():
-    """Run inference for all years sequentially."""
-    base_dir = Path("/Users/cjmack/Documents/GitHub/olmoearth_projects")
-    conus_base = base_dir / "conus_solar_tracking"
-
-    # Allow specifying starting year as command line argument
-    start_year = 2017
-    if len(sys.argv) > 1:
-        try:
-            start_year = int(sys.argv[1])
-            if start_year < 2017 or start_year > 2025:
-                print(f"Error: Year must be between 2017 and 2025")
-                sys.exit(1)
-        except ValueError:
-            print(f"Error: Invalid year '{sys.argv[1]}'")
-            print(f"Usage: {sys.argv[0]} [start_year]")
-            sys.exit(1)
+    """Run inference for all years."""
+    conus_base = Path(__file__).resolve().parent.parent
+
+    parser = argparse.ArgumentParser(description='Run CONUS solar farm inference for 2017-2025')
+    parser.add_argument('start_year', type=int, nargs='?', default=2017,
+                       help='First year to process (default: 2017)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Number of years to run concurrently (default: 1)')
+    parser.add_argument('--gpus', type=int, default=1,
+                       help='Number of GPUs to spread concurrent years over (default: 1)')
+    args = parser.parse_args()
+
+    start_year = args.start_year
+    if start_year < 2017 or start_year > 2025:
+        print(f"Error: Year must be between 2017 and 2025")
+        sys.exit(1)
 
     years = range(start_year, 2026)
 
@@ -109,20 +197,23 @@ def main():
     print("  CONUS Solar Farm Deployment Tracking (2017-2025)")
     print("="*70)
     print(f"  Years to process: {list(years)}")
+    print(f"  Concurrent years: {args.workers} (GPUs: {args.gpus})")
     print(f"  Checkpoint: {CHECKPOINT[:80]}...")
     print(f"  Working directory: {conus_base}")
     print("="*70 + "\n")
 
-    completed_years = []
-    failed_year = None
+    # Relative paths in the project configs are relative to the repository
+    # root; spawned workers inherit the working directory
+    os.chdir(conus_base.parent)
 
-    for year in years:
-        success = run_year(year, base_dir, conus_base, CHECKPOINT)
-        if success:
-            completed_years.append(year)
-        else:
-            failed_year = year
-            break
+    # Download the checkpoint once up front; every year then reads the local copy
+    dotenv.load_dotenv()
+    init_mp()
+    checkpoint_path = str(get_local_checkpoint(UPath(CHECKPOINT)))
+
+    completed_years, failed_year = run_years(
+        years, conus_base, checkpoint_path, args.workers, args.gpus
+    )
 
     # Print summary
     print("\n" + "="*70)
@@ -3,10 +3,13 @@
 Automated visualization runner for Phoenix test results.
 
 Finds the test GeoTIFF output and generates all publication-quality figures.
+rasterio and the plotting modules are imported where they are used, so the
+no-results exit path does not pay for them.
 """
 
-import subprocess
+import multiprocessing
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 
@@ -43,15 +46,42 @@ def find_test_geotiff():
     return geotiff
 
 
+def render_figure(figure_fn, geotiff_path, output_dir, title, info):
+    """Render one visualize_geotiff figure in a worker process.
+
+    Args:
+        figure_fn: create_solar_farm_map or create_overview_panel
+        geotiff_path: Path to input GeoTIFF
+        output_dir: Directory to save figures
+        title: Figure title
+        info: Scan results from scan_geotiff
+    """
+    import rasterio
+    from raster_utils import GDAL_READ_OPTIONS
+
+    with rasterio.Env(**GDAL_READ_OPTIONS):
+        figure_fn(geotiff_path, output_dir, title, threshold=128, dpi=300, info=info)
+
+
 def run_visualizations(geotiff_path, output_dir):
-    """Run all visualization scripts on the test GeoTIFF.
+    """Run all visualizations on the test GeoTIFF.
+
+    The GeoTIFF is scanned once and the result shared by both figures, then
+    handed on to create_summary_report instead of being repeated. The map (with
+    its heat map) and the overview panel are independent renders, so they run
+    in separate processes. Workers come from a forkserver rather than a fork of
+    this process, which has already started GDAL's decoding threads.
 
     Args:
         geotiff_path: Path to input GeoTIFF
         output_dir: Directory to save figures
+
+    Returns:
+        dict: Scan results from scan_geotiff, or None if a figure failed
     """
-    base_dir = Path(__file__).parent.parent
-    viz_script = base_dir / "scripts/visualize_geotiff.py"
+    import rasterio
+    from visualize_geotiff import (create_overview_panel, create_solar_farm_map,
+                                  density_bin_size, scan_geotiff)
 
     print("\n" + "="*70)
     print("  Generating Publication-Quality Figures")
@@ -60,52 +90,62 @@ def run_visualizations(geotiff_path, output_dir):
     print(f"  Output: {output_dir}")
     print("="*70 + "\n")
 
-    # Run visualization script
-    cmd = [
-        "python3",
-        str(viz_script),
-        str(geotiff_path),
-        "--output-dir", str(output_dir),
-        "--title", "Phoenix AZ - Solar Farm Detection (2024)",
-        "--threshold", "128",
-        "--dpi", "300"
-    ]
+    title = "Phoenix AZ - Solar Farm Detection (2024)"
 
     try:
-        print("Running visualize_geotiff.py...")
-        result = subprocess.run(cmd, check=True, capture_output=False)
+        print("Running visualize_geotiff...")
+        with rasterio.open(geotiff_path) as src:
+            bin_size = density_bin_size(src.height)
+        info = scan_geotiff(geotiff_path, threshold=128, bin_size=bin_size)
+        figure_fns = [create_solar_farm_map, create_overview_panel]
+        with ProcessPoolExecutor(max_workers=len(figure_fns),
+                                 mp_context=multiprocessing.get_context('forkserver')) as executor:
+            futures = [
+                executor.submit(render_figure, figure_fn, geotiff_path, output_dir,
+                                title, info)
+                for figure_fn in figure_fns
+            ]
+            for future in futures:
+                future.result()
         print("✓ Visualization complete!")
 
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ Error running visualization script:")
+    except Exception as e:
+        print(f"\n❌ Error running visualizations:")
         print(f"  {e}")
-        return False
+        return None
 
-    return True
+    return info
 
 
-def create_summary_report(geotiff_path, output_dir):
-    """Create a summary report of the test results."""
-    import rasterio
-    import numpy as np
+def create_summary_report(geotiff_path, output_dir, info=None):
+    """Create a summary report of the test results.
 
+    Args:
+        geotiff_path: Path to input GeoTIFF
+        output_dir: Directory to save the report
+        info: Scan results from run_visualizations; the GeoTIFF is only scanned
+            again when not given
+    """
     print("\nCreating summary report...")
 
-    with rasterio.open(geotiff_path) as src:
-        data = src.read(1)
-        bounds = src.bounds
-        crs = src.crs
-        transform = src.transform
+    threshold = 128
+    if info is None:
+        from visualize_geotiff import scan_geotiff
+        info = scan_geotiff(geotiff_path, threshold)
+    bounds = info['bounds']
+    crs = info['crs']
+    transform = info['transform']
+    height, width = info['shape']
 
     # Calculate statistics
     pixel_size = abs(transform.a)
-    threshold = 128
-    binary = (data > threshold).astype(np.uint8)
-    solar_pixels = np.sum(binary)
-    total_pixels = binary.size
+    solar_pixels = info['solar_pixels']
+    total_pixels = height * width
+    total_area_km2 = total_pixels * pixel_size**2 / 1e6
     solar_area_km2 = solar_pixels * pixel_size * pixel_size / 1_000_000
     solar_area_acres = solar_area_km2 * 247.105
     coverage_pct = (solar_pixels / total_pixels) * 100
+    dtype, data_min, data_max = info['dtype'], info['min'], info['max']
 
     # Create report
     report = f"""
@@ -121,9 +161,9 @@ def create_summary_report(geotiff_path, output_dir):
 
 ## Detection Results
 
-- **Raster Dimensions**: {data.shape[1]} × {data.shape[0]} pixels
+- **Raster Dimensions**: {width} × {height} pixels
 - **Spatial Resolution**: {pixel_size:.1f}m
-- **Total Area Analyzed**: {total_pixels * pixel_size**2 / 1e6:.1f} km²
+- **Total Area Analyzed**: {total_area_km2:.1f} km²
 
 ### Solar Farm Detections
 
@@ -135,8 +175,8 @@ def create_summary_report(geotiff_path, output_dir):
 ## Quality Metrics
 
 - **CRS**: {crs}
-- **Data Type**: {data.dtype}
-- **Value Range**: [{data.min()}, {data.max()}]
+- **Data Type**: {dtype}
+- **Value Range**: [{data_min}, {data_max}]
 
 ## Output Files
 
@@ -185,8 +225,7 @@ Run: `python3 conus_solar_tracking/scripts/run_all_years.py`
 
     # Save report
     report_path = output_dir / "TEST_RESULTS_SUMMARY.md"
-    with open(report_path, 'w') as f:
-        f.write(report)
+    report_path.write_text(report)
 
     print(f"✓ Summary report saved: {report_path}")
 
@@ -195,7 +234,7 @@ Run: `python3 conus_solar_tracking/scripts/run_all_years.py`
     with open(stats_path, 'w') as f:
         f.write(f"Phoenix AZ Solar Farm Detection - Summary Statistics\n")
         f.write(f"="*60 + "\n\n")
-        f.write(f"Total Area Analyzed: {total_pixels * pixel_size**2 / 1e6:.2f} km²\n")
+        f.write(f"Total Area Analyzed: {total_area_km2:.2f} km²\n")
         f.write(f"Solar Farm Area: {solar_area_km2:.2f} km²\n")
         f.write(f"Solar Farm Area: {solar_area_acres:.1f} acres\n")
         f.write(f"Coverage: {coverage_pct:.4f}%\n")
@@ -224,13 +263,17 @@ def main():
     (base_dir / "test_results/statistics").mkdir(parents=True, exist_ok=True)
 
     # Run visualizations
-    success = run_visualizations(geotiff, output_dir)
-    if not success:
+    import rasterio
+    from raster_utils import GDAL_READ_OPTIONS
+
+    with rasterio.Env(**GDAL_READ_OPTIONS):
+        info = run_visualizations(geotiff, output_dir)
+    if info is None:
         sys.exit(1)
 
-    # Create summary report
+    # Create summary report from the same scan
     try:
-        create_summary_report(geotiff, base_dir / "test_results")
+        create_summary_report(geotiff, base_dir / "test_results", info)
         print("\n" + "="*70)
         print("  ✓ All visualizations and reports complete!")
         print("="*70)
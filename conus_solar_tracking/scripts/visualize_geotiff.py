@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
-"""
-Create publication-quality maps from solar farm detection GeoTIFF files.
+"""Create publication-quality maps from solar farm detection GeoTIFF files.
 
 Generates high-resolution maps with:
 - Solar farm detections overlaid on satellite basemap
@@ -9,19 +8,156 @@ Generates high-resolution maps with:
 - Export to PNG, PDF, and SVG formats
 """
 
-import numpy as np
-import matplotlib.pyplot as plt
+import argparse
+from pathlib import Path
+
 import matplotlib.patches as mpatches
-from matplotlib.patches import Rectangle
-from matplotlib_scalebar.scalebar import ScaleBar
+import matplotlib.pyplot as plt
+import numpy as np
 import rasterio
-from rasterio.plot import show
-from pathlib import Path
-import argparse
+from matplotlib_scalebar.scalebar import ScaleBar
+from raster_utils import (
+    BINARY_RGBA,
+    GDAL_READ_OPTIONS,
+    block_counts,
+    display_stride,
+    iter_strips,
+)
+from rasterio.enums import Resampling
+
+try:
+    import numba
+except ImportError:  # numba is optional; strip statistics fall back to NumPy
+    numba = None
+
+
+# Approximate rows read per strip when scanning a GeoTIFF
+SCAN_ROWS = 1024
+
+# Resolution of the rasterized map layers embedded in PDFs; text, legends and
+# scale bars stay vector
+PDF_RASTER_DPI = 200
+
+
+def _strip_stats_numpy(data, threshold):
+    """NumPy implementation of _strip_stats."""
+    return int(np.count_nonzero(data > threshold)), data.min(), data.max()
+
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _strip_stats(data, threshold):
+        """Return the count above threshold, min and max of data in one pass."""
+        n_above = 0
+        data_min = data[0, 0]
+        data_max = data[0, 0]
+        for i in numba.prange(data.shape[0]):
+            for j in range(data.shape[1]):
+                value = data[i, j]
+                if value > threshold:
+                    n_above += 1
+                data_min = min(data_min, value)
+                data_max = max(data_max, value)
+        return n_above, data_min, data_max
+else:
+    _strip_stats = _strip_stats_numpy
+
+
+def read_preview(src, max_size, resampling=Resampling.nearest):
+    """Read band 1 of an open dataset at display resolution.
+
+    GDAL serves the read from the closest overview level when the file has
+    overviews, so the full-resolution raster is not decoded.
+
+    Args:
+        src: Open rasterio dataset
+        max_size: Maximum rows and columns of the preview
+        resampling: Resampling used to reduce the raster
+
+    Returns:
+        np.ndarray: Band 1 reduced by a whole factor to fit within max_size
+    """
+    stride = display_stride((src.height, src.width), max_size)
+    return src.read(1, out_shape=(-(-src.height // stride), -(-src.width // stride)),
+                    resampling=resampling)
+
+
+def density_bin_size(height):
+    """Edge length in pixels of the density bins for a raster of this height."""
+    return max(10, height // 50)
+
+
+def scan_geotiff(geotiff_path, threshold=128, bin_size=None):
+    """Compute detection statistics of a GeoTIFF one row strip at a time.
+
+    Only one strip of at most SCAN_ROWS full-width rows is in memory at once,
+    whatever the density bin size, so peak memory grows with the raster width
+    but not its height. Plots read their own previews at display
+    resolution with read_preview, so one scan can serve several figures.
+
+    Args:
+        geotiff_path: Path to input GeoTIFF file
+        threshold: Threshold for binary classification (0-255)
+        bin_size: Edge length in pixels of the detection density bins, or None
+            to skip the density grid. Bins on the right and bottom edges may
+            be partial.
+
+    Returns:
+        dict: Raster bounds, crs, transform, shape and dtype, the solar pixel
+            count, min and max values and the density grid (percent solar per
+            bin, or None)
+    """
+    with rasterio.open(geotiff_path) as src:
+        height, width = src.height, src.width
+
+        # Solar pixels are counted per density bin as strips arrive, so a bin
+        # straddling two strips adds up both parts
+        solar_counts = None
+        if bin_size is not None:
+            solar_counts = np.zeros((-(-height // bin_size), -(-width // bin_size)),
+                                    dtype=np.uint32)
+
+        # Every strip is read into the same buffer instead of a fresh array
+        strip = np.empty((min(SCAN_ROWS, height), width), dtype=src.dtypes[0])
+
+        solar_pixels = 0
+        data_min = data_max = None
+        for window in iter_strips(height, width, SCAN_ROWS):
+            data = src.read(1, window=window, out=strip[:window.height])
+
+            # Count, min and max in a single pass over the strip
+            n_above, strip_min, strip_max = _strip_stats(data, threshold)
+            solar_pixels += int(n_above)
+            data_min = strip_min if data_min is None else min(data_min, strip_min)
+            data_max = strip_max if data_max is None else max(data_max, strip_max)
+
+            if solar_counts is not None:
+                counts = block_counts(data > threshold, bin_size, window.row_off)
+                row = window.row_off // bin_size
+                solar_counts[row:row + counts.shape[0]] += counts
+
+        density = None
+        if solar_counts is not None:
+            # Edge bins may be partial and are averaged over the pixels they hold
+            bin_rows = np.diff(np.arange(0, height, bin_size), append=height)
+            bin_cols = np.diff(np.arange(0, width, bin_size), append=width)
+            density = solar_counts / np.outer(bin_rows, bin_cols) * 100  # Percentage
+
+        return {
+            'bounds': src.bounds,
+            'crs': src.crs,
+            'transform': src.transform,
+            'shape': (height, width),
+            'dtype': src.dtypes[0],
+            'solar_pixels': solar_pixels,
+            'min': data_min,
+            'max': data_max,
+            'density': density,
+        }
 
 
 def create_solar_farm_map(geotiff_path, output_dir, title=None, threshold=128,
-                          dpi=300, figsize=(12, 10)):
+                          dpi=300, figsize=(12, 10), info=None):
     """Create publication-quality map from solar farm GeoTIFF.
 
     Args:
@@ -31,28 +167,37 @@ def create_solar_farm_map(geotiff_path, output_dir, title=None, threshold=128,
         threshold: Threshold for binary classification (0-255)
         dpi: Resolution for output images
         figsize: Figure size in inches (width, height)
+        info: Scan results from scan_geotiff at this threshold; the GeoTIFF is
+            only scanned when not given
+
+    Returns:
+        dict: Scan results from scan_geotiff
     """
     print(f"\nCreating map from: {geotiff_path}")
 
-    # Load GeoTIFF
+    # Scan GeoTIFF and read the map and heat map at figure resolution; the
+    # heat map probabilities are averaged down rather than sampled
+    if info is None:
+        info = scan_geotiff(geotiff_path, threshold)
     with rasterio.open(geotiff_path) as src:
-        data = src.read(1)
-        bounds = src.bounds
-        crs = src.crs
-        transform = src.transform
+        data = read_preview(src, max(figsize) * dpi)
+        heat_data = read_preview(src, max(figsize) * dpi, Resampling.average)
+    bounds = info['bounds']
+    crs = info['crs']
+    transform = info['transform']
 
-        # Get resolution in meters
-        pixel_size_x = abs(transform.a)
-        pixel_size_y = abs(transform.e)
+    # Get resolution in meters
+    pixel_size_x = abs(transform.a)
+    pixel_size_y = abs(transform.e)
 
-    print(f"  Raster size: {data.shape}")
+    print(f"  Raster size: {info['shape']}")
     print(f"  CRS: {crs}")
     print(f"  Bounds: {bounds}")
     print(f"  Resolution: {pixel_size_x}m x {pixel_size_y}m")
 
     # Calculate statistics
-    binary_data = (data > threshold).astype(np.uint8)
-    total_pixels = np.sum(binary_data)
+    binary_data = data > threshold
+    total_pixels = info['solar_pixels']
     total_area_km2 = total_pixels * pixel_size_x * pixel_size_y / 1_000_000
 
     print(f"  Solar farm pixels: {total_pixels:,}")
@@ -61,15 +206,11 @@ def create_solar_farm_map(geotiff_path, output_dir, title=None, threshold=128,
     # Create figure with high DPI
     fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
 
-    # Display detection results
-    # Create custom colormap: white background, solar farms in orange/red
-    from matplotlib.colors import ListedColormap
-    colors = ['white', '#FF6B35']  # White for no solar, vibrant orange for solar
-    cmap = ListedColormap(colors)
-
-    # Plot binary detection
-    im = ax.imshow(binary_data, cmap=cmap, interpolation='nearest',
-                   extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
+    # Plot binary detection: white background, solar farms in orange, colored
+    # directly rather than through a colormap
+    ax.imshow(BINARY_RGBA[binary_data.view(np.uint8)], interpolation='nearest',
+              rasterized=True,
+              extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
 
     # Add title
     if title:
@@ -127,20 +268,31 @@ def create_solar_farm_map(geotiff_path, output_dir, title=None, threshold=128,
     plt.savefig(png_path, dpi=dpi, bbox_inches='tight', facecolor='white')
     print(f"  ✓ Saved: {png_path}")
 
-    # PDF (vector, publication quality)
+    # PDF (vector text and legend, map layer rasterized at PDF_RASTER_DPI)
     pdf_path = output_dir / f"{base_name}_map.pdf"
-    plt.savefig(pdf_path, bbox_inches='tight', facecolor='white')
+    plt.savefig(pdf_path, dpi=PDF_RASTER_DPI, bbox_inches='tight', facecolor='white')
     print(f"  ✓ Saved: {pdf_path}")
 
     plt.close()
 
     # Create heat map version (probability visualization)
-    create_heatmap(geotiff_path, data, bounds, output_dir, title, dpi, figsize)
+    create_heatmap(geotiff_path, heat_data, bounds, output_dir, title, dpi, figsize)
+
+    return info
 
 
 def create_heatmap(geotiff_path, data, bounds, output_dir, title, dpi, figsize):
-    """Create heat map visualization of solar farm probabilities."""
+    """Create heat map visualization of solar farm probabilities.
 
+    Args:
+        geotiff_path: Path to input GeoTIFF file, used to name the output
+        data: Probability values, already reduced to about figsize * dpi pixels
+        bounds: Raster bounds for the image extent
+        output_dir: Directory to save output figures
+        title: Optional title for the map
+        dpi: Resolution for output images
+        figsize: Figure size in inches (width, height)
+    """
     fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
 
     # Use continuous colormap for probabilities
@@ -150,6 +302,7 @@ def create_heatmap(geotiff_path, data, bounds, output_dir, title, dpi, figsize):
 
     # Plot probability values
     im = ax.imshow(data, cmap=cmap, interpolation='bilinear', vmin=0, vmax=255,
+                   rasterized=True,
                    extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
 
     # Add colorbar
@@ -181,27 +334,44 @@ def create_heatmap(geotiff_path, data, bounds, output_dir, title, dpi, figsize):
     plt.close()
 
 
-def create_overview_panel(geotiff_path, output_dir, title=None, threshold=128, dpi=300):
-    """Create multi-panel overview figure with different visualizations."""
+def create_overview_panel(geotiff_path, output_dir, title=None, threshold=128, dpi=300,
+                          info=None):
+    """Create multi-panel overview figure with different visualizations.
 
-    print(f"\nCreating multi-panel overview...")
+    Args:
+        geotiff_path: Path to input GeoTIFF file
+        output_dir: Directory to save output figures
+        title: Optional title for the figure
+        threshold: Threshold for binary classification (0-255)
+        dpi: Resolution for output images
+        info: Scan results from scan_geotiff at this threshold, with a density
+            grid; the GeoTIFF is only scanned when not given
 
-    with rasterio.open(geotiff_path) as src:
-        data = src.read(1)
-        bounds = src.bounds
-        transform = src.transform
-        pixel_size = abs(transform.a)
+    Returns:
+        dict: Scan results from scan_geotiff, including the density grid
+    """
+    print("\nCreating multi-panel overview...")
 
-    binary_data = (data > threshold).astype(np.uint8)
+    with rasterio.open(geotiff_path) as src:
+        # Create coarser grid for density visualization
+        if info is None or info['density'] is None:
+            info = scan_geotiff(geotiff_path, threshold,
+                                bin_size=density_bin_size(src.height))
+        data = read_preview(src, 8 * dpi)
+    bounds = info['bounds']
+    transform = info['transform']
+    pixel_size = abs(transform.a)
+    height, width = info['shape']
+
+    binary_data = data > threshold
 
     # Create 2x2 panel figure
     fig = plt.figure(figsize=(16, 14), dpi=dpi)
 
     # Panel 1: Binary detection
     ax1 = plt.subplot(2, 2, 1)
-    from matplotlib.colors import ListedColormap
-    cmap_binary = ListedColormap(['white', '#FF6B35'])
-    ax1.imshow(binary_data, cmap=cmap_binary, interpolation='nearest',
+    ax1.imshow(BINARY_RGBA[binary_data.view(np.uint8)], interpolation='nearest',
+               rasterized=True,
                extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
     ax1.set_title('A) Binary Detection', fontsize=14, fontweight='bold', loc='left')
     ax1.set_xlabel('Longitude', fontsize=11)
@@ -214,6 +384,7 @@ def create_overview_panel(geotiff_path, output_dir, title=None, threshold=128, d
     colors_gradient = ['#f7f7f7', '#fee090', '#fdae61', '#f46d43', '#d73027', '#a50026']
     cmap_heat = LinearSegmentedColormap.from_list('solar_heat', colors_gradient)
     im2 = ax2.imshow(data, cmap=cmap_heat, interpolation='bilinear', vmin=0, vmax=255,
+                     rasterized=True,
                      extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
     ax2.set_title('B) Detection Confidence', fontsize=14, fontweight='bold', loc='left')
     ax2.set_xlabel('Longitude', fontsize=11)
@@ -224,15 +395,11 @@ def create_overview_panel(geotiff_path, output_dir, title=None, threshold=128, d
 
     # Panel 3: Detection density (spatial binning)
     ax3 = plt.subplot(2, 2, 3)
-    # Create coarser grid for density visualization
-    bin_size = max(10, data.shape[0] // 50)
-    density = np.zeros((data.shape[0] // bin_size, data.shape[1] // bin_size))
-    for i in range(density.shape[0]):
-        for j in range(density.shape[1]):
-            block = binary_data[i*bin_size:(i+1)*bin_size, j*bin_size:(j+1)*bin_size]
-            density[i, j] = np.mean(block) * 100  # Percentage
-
-    im3 = ax3.imshow(density, cmap='YlOrRd', interpolation='bilinear',
+    density = info['density']
+
+    # The grid is tiny, so the renderer's bilinear upsample is cheaper than
+    # handing it a pre-upsampled panel-sized array
+    im3 = ax3.imshow(density, cmap='YlOrRd', interpolation='bilinear', rasterized=True,
                      extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
     ax3.set_title('C) Detection Density', fontsize=14, fontweight='bold', loc='left')
     ax3.set_xlabel('Longitude', fontsize=11)
@@ -246,10 +413,10 @@ def create_overview_panel(geotiff_path, output_dir, title=None, threshold=128, d
     ax4.axis('off')
 
     # Calculate statistics
-    total_pixels = np.sum(binary_data)
+    total_pixels = info['solar_pixels']
     total_area_km2 = total_pixels * pixel_size * pixel_size / 1_000_000
     total_area_acres = total_area_km2 * 247.105
-    coverage_pct = (total_pixels / binary_data.size) * 100
+    coverage_pct = (total_pixels / (height * width)) * 100
 
     stats_text = f"""
     DETECTION STATISTICS
@@ -263,8 +430,8 @@ def create_overview_panel(geotiff_path, output_dir, title=None, threshold=128, d
 
     Raster Properties:
       Resolution: {pixel_size:.1f}m
-      Dimensions: {data.shape[1]} × {data.shape[0]} pixels
-      Total Area: {data.shape[0] * data.shape[1] * pixel_size**2 / 1e6:.1f} km²
+      Dimensions: {width} × {height} pixels
+      Total Area: {height * width * pixel_size**2 / 1e6:.1f} km²
 
     Solar Farm Detection:
       Detected Pixels: {total_pixels:,}
@@ -294,13 +461,16 @@ def create_overview_panel(geotiff_path, output_dir, title=None, threshold=128, d
     plt.savefig(overview_path, dpi=dpi, bbox_inches='tight', facecolor='white')
     print(f"  ✓ Saved: {overview_path}")
 
-    # Also save as PDF
+    # Also save as PDF, with the map panels rasterized at PDF_RASTER_DPI
     overview_pdf_path = output_dir / f"{base_name}_overview.pdf"
-    plt.savefig(overview_pdf_path, bbox_inches='tight', facecolor='white')
+    plt.savefig(overview_pdf_path, dpi=PDF_RASTER_DPI, bbox_inches='tight',
+                facecolor='white')
     print(f"  ✓ Saved: {overview_pdf_path}")
 
     plt.close()
 
+    return info
+
 
 def main():
     """Main function to process GeoTIFF and create visualizations."""
@@ -336,9 +506,17 @@ def main():
     print(f"  Output: {output_dir}")
     print("="*70)
 
-    # Create visualizations
-    create_solar_farm_map(geotiff_path, output_dir, args.title, args.threshold, args.dpi)
-    create_overview_panel(geotiff_path, output_dir, args.title, args.threshold, args.dpi)
+    with rasterio.Env(**GDAL_READ_OPTIONS):
+        # Scan the GeoTIFF once and share the statistics between the figures
+        with rasterio.open(geotiff_path) as src:
+            bin_size = density_bin_size(src.height)
+        info = scan_geotiff(geotiff_path, args.threshold, bin_size=bin_size)
+
+        # Create visualizations
+        create_solar_farm_map(geotiff_path, output_dir, args.title, args.threshold,
+                              args.dpi, info=info)
+        create_overview_panel(geotiff_path, output_dir, args.title, args.threshold,
+                              args.dpi, info=info)
 
     print("\n" + "="*70)
     print("  ✓ Visualization complete!")
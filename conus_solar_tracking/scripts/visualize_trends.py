@@ -7,15 +7,27 @@ Generates plots and charts showing:
 - Annual new installations
 - Growth rates
 - Year-over-year comparisons
+
+pandas and Matplotlib are imported where they are used, so the missing-summary
+exit path does not pay for them.
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from pathlib import Path
 from datetime import datetime
 
 
+# Columns of solar_growth_summary.csv used by the plots, with their types
+SUMMARY_DTYPES = {
+    'year1': 'int64',
+    'year2': 'int64',
+    'total_year1_km2': 'float64',
+    'total_year2_km2': 'float64',
+    'new_installations_km2': 'float64',
+    'net_change_km2': 'float64',
+    'growth_rate_pct': 'float64',
+}
+
+
 def create_deployment_trends_plot(df, output_dir):
     """Create comprehensive deployment trends visualization.
 
@@ -23,6 +35,8 @@ def create_deployment_trends_plot(df, output_dir):
         df: DataFrame with change detection statistics
         output_dir: Directory to save plot
     """
+    import matplotlib.pyplot as plt
+
     # Build cumulative area timeline
     years = [df['year1'].iloc[0]] + df['year2'].tolist()
     cumulative_area = [df['total_year1_km2'].iloc[0]] + df['total_year2_km2'].tolist()
@@ -67,15 +81,8 @@ def create_deployment_trends_plot(df, output_dir):
     ax2.set_xlim(2017.5, 2025.5)
 
     # Add value labels on bars
-    for bar in bars:
-        height = bar.get_height()
-        ax2.annotate(f'{height:,.0f}',
-                    xy=(bar.get_x() + bar.get_width() / 2, height),
-                    xytext=(0, 5),
-                    textcoords='offset points',
-                    ha='center',
-                    fontsize=9,
-                    color='black')
+    labels = [f'{height:,.0f}' for height in df['new_installations_km2']]
+    ax2.bar_label(bars, labels=labels, padding=5, fontsize=9, color='black')
 
     plt.tight_layout()
 
@@ -99,6 +106,8 @@ def create_growth_rate_plot(df, output_dir):
         df: DataFrame with change detection statistics
         output_dir: Directory to save plot
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(12, 6))
 
     # Create bar plot with color based on positive/negative growth
@@ -116,18 +125,10 @@ def create_growth_rate_plot(df, output_dir):
     ax.grid(True, alpha=0.3, linestyle='--', axis='y')
     ax.set_xlim(2017.5, 2025.5)
 
-    # Add value labels
-    for bar in bars:
-        height = bar.get_height()
-        label_y = height + (1 if height >= 0 else -3)
-        ax.annotate(f'{height:+.1f}%',
-                   xy=(bar.get_x() + bar.get_width() / 2, height),
-                   xytext=(0, 5 if height >= 0 else -15),
-                   textcoords='offset points',
-                   ha='center',
-                   fontsize=9,
-                   color='black',
-                   fontweight='bold')
+    # Add value labels (bar_label places them below negative bars)
+    labels = [f'{rate:+.1f}%' for rate in df['growth_rate_pct']]
+    ax.bar_label(bars, labels=labels, padding=5, fontsize=9, color='black',
+                 fontweight='bold')
 
     plt.tight_layout()
 
@@ -191,8 +192,10 @@ def main():
         print("  Run analyze_changes.py first to generate the summary data.")
         return
 
+    import pandas as pd
+
     print(f"\nLoading summary data from: {summary_path}")
-    df = pd.read_csv(summary_path)
+    df = pd.read_csv(summary_path, usecols=list(SUMMARY_DTYPES), dtype=SUMMARY_DTYPES)
 
     print(f"Years covered: {df['year1'].min()} - {df['year2'].max()}")
     print(f"Total change periods: {len(df)}\n")
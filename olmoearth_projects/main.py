@@ -4,11 +4,6 @@ import argparse
 import importlib
 import sys
 
-import dotenv
-import jsonargparse
-import jsonargparse.typing
-from rslearn.utils.jsonargparse import init_jsonargparse
-
 from olmoearth_projects.utils.logging import get_logger
 from olmoearth_projects.utils.mp import init_mp
 
@@ -23,6 +18,12 @@ def run_workflow(project: str, workflow: str, args: list[str]) -> None:
         workflow: the workflow name.
         args: arguments to pass to jsonargparse for running the workflow function.
     """
+    # jsonargparse and rslearn are only imported once a workflow is selected, so
+    # usage errors and --help do not pay for their import chains.
+    import jsonargparse
+    from rslearn.utils.jsonargparse import init_jsonargparse
+
+    init_jsonargparse()
     module = importlib.import_module(f"olmoearth_projects.{project}")
     workflow_fn = module.workflows[workflow]
     logger.info(f"running {workflow} for {project}")
@@ -32,15 +33,17 @@ def run_workflow(project: str, workflow: str, args: list[str]) -> None:
 
 def main() -> None:
     """Main entrypoint function for olmoearth_projects."""
-    dotenv.load_dotenv()
     parser = argparse.ArgumentParser(description="olmoearth_projects")
     parser.add_argument("project", help="The project to execute a workflow for.")
     parser.add_argument("workflow", help="The name of the workflow.")
     args = parser.parse_args(args=sys.argv[1:3])
+
+    import dotenv
+
+    dotenv.load_dotenv()
     run_workflow(args.project, args.workflow, sys.argv[3:])
 
 
 if __name__ == "__main__":
     init_mp()
-    init_jsonargparse()
     main()
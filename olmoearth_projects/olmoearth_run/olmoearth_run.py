@@ -1,10 +1,14 @@
 """Run OlmoEarthRunPredictRunner inference pipeline."""
 
+import functools
 import hashlib
 import logging
+import os
 import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from enum import StrEnum
+from itertools import repeat
 from pathlib import Path
 
 import fsspec
@@ -17,10 +21,94 @@ from olmoearth_projects.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Environment variables tuning remote checkpoint downloads: the number of
+# concurrent range reads and the size of each read in MiB.
+DOWNLOAD_PARALLELISM_ENV_VAR = "OE_CKPT_DOWNLOAD_PARALLELISM"
+DOWNLOAD_CHUNK_MB_ENV_VAR = "OE_CKPT_CHUNK_MB"
+
+# Object metadata fields identifying a version of a remote file, in order of
+# preference: GCS etag/generation/crc32c and S3 ETag.
+VERSION_INFO_KEYS = ["etag", "ETag", "generation", "crc32c"]
+
+
+@functools.cache
+def _checkpoint_cache_dir() -> Path:
+    """Return the local checkpoint cache directory, creating it on first use."""
+    cache_dir = (
+        Path(tempfile.gettempdir()) / "rslearn_cache" / "olmoearth_run_checkpoints"
+    )
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def _download_checkpoint(checkpoint_path: UPath, local_path: Path, size: int) -> None:
+    """Download a remote checkpoint using concurrent range reads.
+
+    Chunks are fetched in parallel and written at their offsets into a temporary
+    file next to local_path, which is renamed into place once complete, so
+    concurrent callers never see a partially written checkpoint.
+
+    Args:
+        checkpoint_path: a UPath to the remote checkpoint file.
+        local_path: the local path to download the checkpoint to.
+        size: the size of the remote checkpoint in bytes.
+    """
+    parallelism = int(os.environ.get(DOWNLOAD_PARALLELISM_ENV_VAR, "8"))
+    chunk_size = int(os.environ.get(DOWNLOAD_CHUNK_MB_ENV_VAR, "16")) * 1024 * 1024
+    fs = checkpoint_path.fs
+
+    def fetch_chunk(fd: int, start: int) -> None:
+        end = min(start + chunk_size, size)
+        data = memoryview(fs.cat_file(checkpoint_path.path, start=start, end=end))
+        while data:
+            written = os.pwrite(fd, data, start)
+            data = data[written:]
+            start += written
+
+    fd, tmp_name = tempfile.mkstemp(dir=local_path.parent, suffix=".tmp")
+    try:
+        try:
+            os.ftruncate(fd, size)
+            with ThreadPoolExecutor(max_workers=parallelism) as executor:
+                # Consuming the results re-raises the first failed chunk.
+                list(executor.map(fetch_chunk, repeat(fd), range(0, size, chunk_size)))
+        finally:
+            os.close(fd)
+        os.replace(tmp_name, local_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def _copy_checkpoint(checkpoint_path: UPath, local_path: Path) -> None:
+    """Download a remote checkpoint of unknown size as a single streamed copy.
+
+    Like _download_checkpoint, the copy is written to a temporary file next to
+    local_path and renamed into place once complete.
+
+    Args:
+        checkpoint_path: a UPath to the remote checkpoint file.
+        local_path: the local path to download the checkpoint to.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=local_path.parent, suffix=".tmp")
+    try:
+        with checkpoint_path.open("rb") as src, os.fdopen(fd, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_name, local_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
 
 def get_local_checkpoint(checkpoint_path: UPath) -> Path:
     """Get a local path to the specified checkpoint file, caching it locally if needed.
 
+    The cache is keyed by the remote object's version (its ETag, or failing that
+    its generation or CRC32C) and size rather than by its URL, so an overwritten
+    checkpoint is downloaded again and URLs pointing at the same object share one
+    cached copy. The URL is only used when the filesystem reports no version or
+    no size, and a checkpoint of unknown size is downloaded as one streamed copy.
+
     Args:
         checkpoint_path: a UPath to the checkpoint file.
 
@@ -33,22 +121,33 @@ def get_local_checkpoint(checkpoint_path: UPath) -> Path:
         logger.info("using local checkpoint at %s", checkpoint_path)
         return Path(checkpoint_path)
 
-    cache_id = hashlib.sha256(str(checkpoint_path).encode()).hexdigest()
-    local_upath = (
-        UPath(tempfile.gettempdir())
-        / "rslearn_cache"
-        / "olmoearth_run_checkpoints"
-        / f"{cache_id}.ckpt"
-    )
-
-    if not local_upath.exists():
-        logger.info("caching checkpoint from %s to %s", checkpoint_path, local_upath)
-        local_upath.parent.mkdir(parents=True, exist_ok=True)
-        with checkpoint_path.open("rb") as src, local_upath.open("wb") as dst:
-            shutil.copyfileobj(src, dst)
+    info = checkpoint_path.fs.info(checkpoint_path.path)
+    # Some filesystems, such as HTTP(S), may not report a size.
+    size = info.get("size")
+    version = next((info[key] for key in VERSION_INFO_KEYS if info.get(key)), None)
+    if version is None or size is None:
+        cache_key = str(checkpoint_path)
+    else:
+        cache_key = f"{version}:{size}"
+    cache_id = hashlib.sha256(cache_key.encode()).hexdigest()
+    local_path = _checkpoint_cache_dir() / f"{cache_id}.ckpt"
+
+    # A size mismatch means an earlier copy is truncated or stale. Copies are
+    # renamed into place once complete, so any copy of unknown size is usable.
+    try:
+        cached_size = local_path.stat().st_size
+        is_cached = size is None or cached_size == size
+    except FileNotFoundError:
+        is_cached = False
+    if not is_cached:
+        logger.info("caching checkpoint from %s to %s", checkpoint_path, local_path)
+        if size is None:
+            _copy_checkpoint(checkpoint_path, local_path)
+        else:
+            _download_checkpoint(checkpoint_path, local_path, size)
 
-    logger.info("using cached checkpoint at %s", local_upath)
-    return Path(local_upath)
+    logger.info("using cached checkpoint at %s", local_path)
+    return local_path
 
 
 def prepare_labeled_windows(project_path: Path, scratch_path: Path) -> None:
@@ -87,7 +186,12 @@ def finetune(project_path: Path, scratch_path: Path) -> None:
     runner.fine_tune()
 
 
-def olmoearth_run(config_path: Path, scratch_path: Path, checkpoint_path: str) -> None:
+def olmoearth_run(
+    config_path: Path,
+    scratch_path: Path,
+    checkpoint_path: str,
+    overlap_postprocess: bool = False,
+) -> None:
     """Run EsPredictRunner inference pipeline.
 
     Args:
@@ -95,6 +199,10 @@ def olmoearth_run(config_path: Path, scratch_path: Path, checkpoint_path: str) -
             and postprocessing_strategies.yaml configuration files.
         scratch_path: directory to use for scratch space.
         checkpoint_path: path to the model checkpoint.
+        overlap_postprocess: postprocess each partition in a background thread
+            while the next partition runs inference. This requires the runner's
+            run_inference and postprocess to be safe to call concurrently, and a
+            failed postprocess is only raised once the next inference finishes.
     """
     configure_logging(log_level=logging.INFO)
     runner = OlmoEarthRunPredictRunner(
@@ -109,11 +217,27 @@ def olmoearth_run(config_path: Path, scratch_path: Path, checkpoint_path: str) -
     logger.info("Building dataset across partitions")
     runner.build_dataset(partitions)
 
-    for partition_id in partitions:
-        logger.info(f"Running inference for partition {partition_id}")
-        runner.run_inference(partition_id)
-        logger.info(f"Postprocessing for partition {partition_id}")
-        runner.postprocess(partition_id)
+    if not overlap_postprocess:
+        for partition_id in partitions:
+            logger.info(f"Running inference for partition {partition_id}")
+            runner.run_inference(partition_id)
+            logger.info(f"Postprocessing for partition {partition_id}")
+            runner.postprocess(partition_id)
+    else:
+        # Postprocessing a partition (CPU/IO-bound) runs in the background while
+        # the next partition runs inference. At most one postprocess is in flight,
+        # so finished inference outputs cannot pile up.
+        with ThreadPoolExecutor(max_workers=1) as postprocess_executor:
+            pending = None
+            for partition_id in partitions:
+                logger.info(f"Running inference for partition {partition_id}")
+                runner.run_inference(partition_id)
+                if pending is not None:
+                    pending.result()
+                logger.info(f"Postprocessing for partition {partition_id}")
+                pending = postprocess_executor.submit(runner.postprocess, partition_id)
+            if pending is not None:
+                pending.result()
 
     logger.info("Combining across partitions")
     runner.combine(partitions)
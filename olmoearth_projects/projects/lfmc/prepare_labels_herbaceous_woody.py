@@ -11,6 +11,7 @@ uv run python -m olmoearth_projects.projects.lfmc.prepare_labels_herbaceous_wood
 """
 
 import argparse
+import importlib.util
 import tempfile
 from datetime import datetime
 from enum import StrEnum
@@ -93,6 +94,14 @@ class Column(StrEnum):
 
 SHEET_NAME = "LFMC data"
 
+# The Rust-based calamine reader parses the workbook several times faster than
+# openpyxl; use it when python-calamine is installed.
+EXCEL_ENGINE = (
+    "calamine"
+    if importlib.util.find_spec("python_calamine") is not None
+    else "openpyxl"
+)
+
 COLUMN_MAP = {
     "Sorting ID": Column.SORTING_ID,
     "Contact": Column.CONTACT,
@@ -167,7 +176,7 @@ def download_workbook(output_path: Path) -> None:
     response.raise_for_status()
 
     total_size = int(response.headers.get("content-length", 0))
-    block_size = 1024
+    block_size = 1 << 20
 
     with tqdm(
         total=total_size, unit="B", unit_scale=True, desc="Downloading"
@@ -181,22 +190,12 @@ def download_workbook(output_path: Path) -> None:
         raise RuntimeError("Could not download file")
 
 
-def process_fuel_type_data(
-    data_df: pd.DataFrame, fuel_type_filter: str | None = None
-) -> pd.DataFrame:
-    """Process and group data for a specific fuel type or all data."""
-    if fuel_type_filter:
-        filtered_df = data_df[data_df[FUEL_TYPE_COLUMN] == fuel_type_filter].copy()
-        print(
-            f"\nProcessing {fuel_type_filter} samples: {len(filtered_df)} raw samples"
-        )
-    else:
-        filtered_df = data_df.copy()
-        print(f"\nProcessing all samples: {len(filtered_df)} raw samples")
-
-    if len(filtered_df) == 0:
-        return pd.DataFrame()
+def group_samples(data_df: pd.DataFrame) -> pd.DataFrame:
+    """Average the samples taken at the same location and date for each fuel type.
 
+    Fuel type is one of the group keys, so the per-fuel-type datasets are row
+    subsets of this single aggregation.
+    """
     # Group by location, date, and fuel type, then aggregate
     # From the Globe-LFMC-2.0 paper:
     # "For remote sensing applications, it is recommended to average the LFMC measurements taken on
@@ -204,7 +203,7 @@ def process_fuel_type_data(
     # choice of which functional type to include in the average can be guided by the land cover type
     # of that pixel. For example, in open canopy forests, both trees and shrubs (or grass) could be
     # included."
-    grouped_df = filtered_df.groupby(
+    grouped_df = data_df.groupby(
         [
             Column.LATITUDE,
             Column.LONGITUDE,
@@ -220,21 +219,32 @@ def process_fuel_type_data(
             Column.VALUE: "mean",
         }
     )
+    return grouped_df
+
+
+def process_fuel_type_data(
+    grouped_df: pd.DataFrame, num_raw_samples: int, fuel_type_filter: str | None = None
+) -> pd.DataFrame:
+    """Select the grouped data for a specific fuel type or all data and name tasks."""
+    if fuel_type_filter:
+        grouped_df = grouped_df[grouped_df[FUEL_TYPE_COLUMN] == fuel_type_filter]
+        print(f"\nProcessing {fuel_type_filter} samples: {num_raw_samples} raw samples")
+    else:
+        print(f"\nProcessing all samples: {num_raw_samples} raw samples")
+
+    if len(grouped_df) == 0:
+        return pd.DataFrame()
 
     # Create unique task names by combining site name with count suffix
     site_counts = grouped_df.groupby(Column.SITE_NAME).cumcount() + 1
-    grouped_df[TASK_NAME_COLUMN] = (
-        grouped_df[Column.SITE_NAME].astype(str)
-        + "_"
-        + site_counts.astype(str).str.zfill(5)
-    )
-
-    # Add time columns
-    grouped_df[START_TIME_COLUMN] = pd.to_datetime(
-        grouped_df[Column.SAMPLING_DATE], errors="raise"
-    )
-    grouped_df[END_TIME_COLUMN] = pd.to_datetime(
-        grouped_df[Column.SAMPLING_DATE], errors="raise"
+    grouped_df = grouped_df.assign(
+        **{
+            TASK_NAME_COLUMN: grouped_df[Column.SITE_NAME].astype(str)
+            + "_"
+            + site_counts.astype(str).str.zfill(5),
+            START_TIME_COLUMN: grouped_df[Column.SAMPLING_DATE],
+            END_TIME_COLUMN: grouped_df[Column.SAMPLING_DATE],
+        }
     )
 
     print(f"  Number of tasks: {grouped_df[TASK_NAME_COLUMN].nunique()}")
@@ -270,9 +280,14 @@ def create_csv(
     """
     print("Reading the workbook")
     df = pd.read_excel(
-        input_workbook_path, sheet_name=SHEET_NAME, usecols=list(COLUMN_MAP.keys())
+        input_workbook_path,
+        sheet_name=SHEET_NAME,
+        usecols=list(COLUMN_MAP.keys()),
+        engine=EXCEL_ENGINE,
     )
     df = df.rename(columns=COLUMN_MAP)
+    # Parse dates once up front; the date filter and the time columns reuse them.
+    df[Column.SAMPLING_DATE] = pd.to_datetime(df[Column.SAMPLING_DATE], errors="raise")
     print(f"Initial number of samples: {len(df)}")
 
     # Calculate 99.9% percentile and clip LFMC values
@@ -321,24 +336,31 @@ def create_csv(
         f"Unique species functional types ({len(unique_functional_types)}): {list(unique_functional_types)}"
     )
 
-    # Add fuel type and value columns based on species functional type
-    species_type_lower = df[Column.SPECIES_FUNCTIONAL_TYPE].str.lower()
-
-    # Create fuel type column
-    df[FUEL_TYPE_COLUMN] = None
-    df.loc[species_type_lower.isin(HERBACEOUS_FUNCTIONAL_TYPES), FUEL_TYPE_COLUMN] = (
-        "herbaceous"
-    )
-    df.loc[species_type_lower.isin(WOODY_FUNCTIONAL_TYPES), FUEL_TYPE_COLUMN] = "woody"
+    # Add fuel type column based on species functional type. There are only a
+    # handful of distinct functional types, so each is lowercased and classified
+    # once and the result mapped onto the rows; other types are left as NaN.
+    fuel_types = {}
+    for functional_type in unique_functional_types:
+        if not isinstance(functional_type, str):
+            continue
+        if functional_type.lower() in HERBACEOUS_FUNCTIONAL_TYPES:
+            fuel_types[functional_type] = "herbaceous"
+        elif functional_type.lower() in WOODY_FUNCTIONAL_TYPES:
+            fuel_types[functional_type] = "woody"
+    df[FUEL_TYPE_COLUMN] = df[Column.SPECIES_FUNCTIONAL_TYPE].map(fuel_types)
 
     # Filter to only herbaceous and woody samples
     df = df[df[FUEL_TYPE_COLUMN].notna()]
     print(f"After filtering to herbaceous/woody samples: {len(df)} samples")
 
-    # Process all three datasets
-    all_df = process_fuel_type_data(df)
-    herbaceous_df = process_fuel_type_data(df, "herbaceous")
-    woody_df = process_fuel_type_data(df, "woody")
+    # Aggregate once and derive all three datasets from the result
+    grouped_df = group_samples(df)
+    raw_counts = df[FUEL_TYPE_COLUMN].value_counts()
+    all_df = process_fuel_type_data(grouped_df, len(df))
+    herbaceous_df = process_fuel_type_data(
+        grouped_df, raw_counts.get("herbaceous", 0), "herbaceous"
+    )
+    woody_df = process_fuel_type_data(grouped_df, raw_counts.get("woody", 0), "woody")
 
     # Save CSV files
     all_csv_path = output_dir / "labels_all.csv"
@@ -1,14 +1,47 @@
 """Check the label quality of the dataset."""
 
 import argparse
+from collections import defaultdict
 
 import geopandas as gpd
+import numpy as np
+import shapely
 from rslearn.dataset.dataset import Dataset
+from rslearn.dataset.window import Window
 from rslearn.utils.geometry import WGS84_PROJECTION
 from upath import UPath
 
 from olmoearth_projects.utils.label_quality import check_label_quality
 
+
+def get_wgs84_boxes(windows: list[Window]) -> gpd.GeoSeries:
+    """Get the bounds of each window as a box in WGS84.
+
+    Windows sharing a projection are boxed and reprojected together with one
+    vectorized call, instead of one reprojection per window.
+
+    Args:
+        windows: the windows to get boxes for.
+
+    Returns:
+        a GeoSeries with the WGS84 box of each window, in the same order.
+    """
+    indices_by_projection = defaultdict(list)
+    for idx, window in enumerate(windows):
+        indices_by_projection[window.projection].append(idx)
+
+    geometry = np.empty(len(windows), dtype=object)
+    for projection, indices in indices_by_projection.items():
+        # Undo the pixel resolution to get bounds in CRS units.
+        resolution = [projection.x_resolution, projection.y_resolution] * 2
+        bounds = np.array([windows[idx].bounds for idx in indices]) * resolution
+        boxes = shapely.box(bounds[:, 0], bounds[:, 1], bounds[:, 2], bounds[:, 3])
+        geometry[indices] = (
+            gpd.GeoSeries(boxes, crs=projection.crs).to_crs(WGS84_PROJECTION.crs).values
+        )
+    return gpd.GeoSeries(geometry, crs=WGS84_PROJECTION.crs)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -23,6 +56,12 @@ if __name__ == "__main__":
         default="train",
         help="Split to assess. Use 'all' to assess all splits",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=64,
+        help="Number of worker processes to use for loading windows",
+    )
     parser.add_argument("--crop_type", action="store_true", default=False)
 
     args = parser.parse_args()
@@ -37,14 +76,16 @@ if __name__ == "__main__":
         groups = ["crop_type"]
     else:
         groups = ["gaza", "manica", "zambezia"]
-    windows = dataset.load_windows(show_progress=True, groups=groups)
-    labels, geometry = [], []
-    for window in windows:
-        split = window.options["split"]
-        if split in splits_to_keep:
-            labels.append(window.options["category"])
-            geometry.append(window.get_geometry().to_projection(WGS84_PROJECTION).shp)
-
-    df = gpd.GeoDataFrame({"label": labels, "geometry": geometry})
+    # The split is only recorded in each window's metadata, so windows cannot be
+    # filtered before loading; load them in parallel instead.
+    windows = dataset.load_windows(
+        workers=args.workers, show_progress=True, groups=groups
+    )
+    windows = [
+        window for window in windows if window.options["split"] in splits_to_keep
+    ]
+    labels = [window.options["category"] for window in windows]
+
+    df = gpd.GeoDataFrame({"label": labels}, geometry=get_wgs84_boxes(windows))
     print(f"Checking label quality for {len(df)} instances.", flush=True)
     check_label_quality(df)
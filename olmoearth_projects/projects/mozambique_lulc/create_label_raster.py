@@ -18,6 +18,7 @@ to include the following entry:
 
 import argparse
 import multiprocessing
+from typing import Any
 
 import numpy as np
 import tqdm
@@ -47,35 +48,54 @@ CROPTYPE_CLASS_NAMES = [
     "millet",
     "sorghum",
 ]
+# Class IDs by name; LULC IDs take precedence over crop type IDs.
+CLASS_IDS = {
+    **{name: idx for idx, name in enumerate(CROPTYPE_CLASS_NAMES)},
+    **{name: idx for idx, name in enumerate(LULC_CLASS_NAMES)},
+}
 PROPERTY_NAME = "category"
 BAND_NAME = "label"
 
+# The formats are stateless, so each worker process reuses one instance of each.
+VECTOR_FORMAT = GeojsonVectorFormat()
+RASTER_FORMAT = GeotiffRasterFormat()
+
+# Worker processes are replaced after this many chunks of windows, to bound
+# memory growth from per-process caches.
+MAX_TASKS_PER_CHILD = 512
+
 
 def create_label_raster(window: Window) -> None:
     """Create label raster for the given window."""
     label_dir = window.get_layer_dir("label")
-    features = GeojsonVectorFormat().decode_vector(
-        label_dir, window.projection, window.bounds
-    )
-    class_name = features[0].properties[PROPERTY_NAME]
-    try:
-        class_id = LULC_CLASS_NAMES.index(class_name)
-    except ValueError:
-        class_id = CROPTYPE_CLASS_NAMES.index(class_name)
-
-    # Draw the class_id in the middle 1x1 of the raster.
-    raster = np.zeros(
-        (1, window.bounds[3] - window.bounds[1], window.bounds[2] - window.bounds[0]),
-        dtype=np.uint8,
-    )
-    raster[:, raster.shape[1] // 2, raster.shape[2] // 2] = class_id
+    features = VECTOR_FORMAT.decode_vector(label_dir, window.projection, window.bounds)
+    class_id = CLASS_IDS[features[0].properties[PROPERTY_NAME]]
+
+    # Write the class_id as a 1x1 raster at the middle pixel of the window. Reads
+    # warp the GeoTIFF onto the window bounds, so the rest of the window decodes
+    # as 0 without a full-size zero raster being allocated and compressed.
+    col = window.bounds[0] + (window.bounds[2] - window.bounds[0]) // 2
+    row = window.bounds[1] + (window.bounds[3] - window.bounds[1]) // 2
+    raster = np.full((1, 1, 1), class_id, dtype=np.uint8)
     raster_dir = window.get_raster_dir("label_raster", [BAND_NAME])
-    GeotiffRasterFormat().encode_raster(
-        raster_dir, window.projection, window.bounds, raster
+    RASTER_FORMAT.encode_raster(
+        raster_dir, window.projection, (col, row, col + 1, row + 1), raster
     )
     window.mark_layer_completed("label_raster")
 
 
+def create_label_raster_from_metadata(
+    path_and_metadata: tuple[UPath, dict[str, Any]],
+) -> None:
+    """Create label raster for a window given its path and metadata.
+
+    Windows loaded from a dataset index hold a reference to the whole index, so
+    workers are sent just the path and metadata of each window rather than the
+    Window objects, which would pickle the index into every chunk.
+    """
+    create_label_raster(Window.from_metadata(*path_and_metadata))
+
+
 if __name__ == "__main__":
     multiprocessing.set_start_method("forkserver")
     parser = argparse.ArgumentParser()
@@ -102,8 +122,20 @@ if __name__ == "__main__":
     windows = dataset.load_windows(
         workers=args.workers, show_progress=True, groups=groups
     )
-    p = multiprocessing.Pool(args.workers)
-    outputs = p.imap_unordered(create_label_raster, windows)
-    for _ in tqdm.tqdm(outputs, total=len(windows)):
-        pass
-    p.close()
+    if args.workers <= 1:
+        # Skip the worker pool bring-up entirely for small or debugging runs.
+        for window in tqdm.tqdm(windows):
+            create_label_raster(window)
+    else:
+        # Send windows to the workers in chunks, so the per-task IPC overhead is
+        # amortized over many small windows.
+        chunksize = max(1, len(windows) // (args.workers * 8))
+        with multiprocessing.Pool(
+            args.workers, maxtasksperchild=MAX_TASKS_PER_CHILD
+        ) as p:
+            tasks = [(window.path, window.get_metadata()) for window in windows]
+            outputs = p.imap_unordered(
+                create_label_raster_from_metadata, tasks, chunksize=chunksize
+            )
+            for _ in tqdm.tqdm(outputs, total=len(windows)):
+                pass
@@ -1,12 +1,19 @@
 """Create windows for crop type mapping from GPKG files (fixed splits)."""
 
 import argparse
+import functools
+import importlib.util
+import json
 import multiprocessing
 from collections.abc import Iterable
 from datetime import UTC, datetime
+from multiprocessing.shared_memory import SharedMemory
 from pathlib import Path
+from typing import Any
 
 import geopandas as gpd
+import numpy as np
+import pyproj
 import shapely
 import tqdm
 from olmoearth_run.runner.tools.data_splitters.data_splitter_interface import (
@@ -15,12 +22,18 @@ from olmoearth_run.runner.tools.data_splitters.data_splitter_interface import (
 from olmoearth_run.runner.tools.data_splitters.spatial_data_splitter import (
     SpatialDataSplitter,
 )
-from rslearn.const import WGS84_PROJECTION
+from rasterio.crs import CRS
 from rslearn.dataset import Window
-from rslearn.utils import Projection, STGeometry, get_utm_ups_crs
+from rslearn.utils import Projection
 from rslearn.utils.feature import Feature
-from rslearn.utils.mp import star_imap_unordered
-from rslearn.utils.vector_format import GeojsonVectorFormat
+from rslearn.utils.fsspec import open_atomic
+from rslearn.utils.get_utm_ups_crs import (
+    UPS_NORTH_EPSG,
+    UPS_NORTH_THRESHOLD,
+    UPS_SOUTH_EPSG,
+    UPS_SOUTH_THRESHOLD,
+)
+from rslearn.utils.vector_format import GeojsonCoordinateMode, GeojsonVectorFormat
 from upath import UPath
 
 WINDOW_RESOLUTION = 10
@@ -74,47 +87,125 @@ GROUP_TIME = {
 }
 
 
+class FastGeojsonVectorFormat(GeojsonVectorFormat):
+    """GeojsonVectorFormat that serializes with the C JSON encoder.
+
+    json.dump streams through the pure-Python encoder, which dominated the cost of
+    writing these one-feature label files. Encoding to a string with json.dumps
+    first produces the same bytes several times faster.
+    """
+
+    def encode_to_file(self, fname: UPath, features: list[Feature]) -> None:
+        """Encode vector data to a specific file.
+
+        Args:
+            fname: the file to write to
+            features: the vector data
+        """
+        if self.coordinate_mode != GeojsonCoordinateMode.PIXEL or not features:
+            super().encode_to_file(fname, features)
+            return
+
+        # Same FeatureCollection as GeojsonVectorFormat writes in PIXEL mode.
+        output_projection = features[0].geometry.projection
+        fc = {
+            "type": "FeatureCollection",
+            "properties": output_projection.serialize(),
+            "features": [
+                feat.to_projection(output_projection).to_geojson() for feat in features
+            ],
+        }
+        with open_atomic(fname, "w") as f:
+            f.write(json.dumps(fc))
+
+
+# pyogrio can hand the GPKG columns to GeoPandas as Arrow buffers, which is
+# faster than building them up row by row; use it when pyarrow is installed.
+USE_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+# The format is stateless, so each worker process reuses one instance.
+VECTOR_FORMAT = FastGeojsonVectorFormat()
+
+# Each worker process is sent about this many chunks of windows per GPKG, so the
+# per-task dispatch overhead is amortized over many windows.
+CHUNKS_PER_WORKER = 8
+
+# State shared by every window of a GPKG, set once per process by init_worker
+# rather than being pickled with every job: the splitter used to re-split train
+# windows, the create_window arguments other than the per-record ones, and the
+# array of per-record arguments from make_jobs. Pool workers map the array from
+# shared memory, so each job sent to them is just a range of its rows.
+_splitter: DataSplitterInterface | None = None
+_window_kwargs: dict[str, Any] = {}
+_jobs: np.ndarray | None = None
+_shared_memory: SharedMemory | None = None
+
+
+def init_worker(
+    splitter: DataSplitterInterface, window_kwargs: dict[str, Any], jobs: np.ndarray
+) -> None:
+    """Set the state that create_windows_for_range uses in this process."""
+    global _splitter, _window_kwargs, _jobs
+    _splitter = splitter
+    _window_kwargs = window_kwargs
+    _jobs = jobs
+
+
+def init_shared_worker(
+    splitter: DataSplitterInterface,
+    window_kwargs: dict[str, Any],
+    shared_memory_name: str,
+    dtype: np.dtype,
+    count: int,
+) -> None:
+    """Set the worker state, with the jobs array mapped from shared memory."""
+    global _shared_memory
+    _shared_memory = SharedMemory(shared_memory_name)
+    jobs = np.ndarray(count, dtype=dtype, buffer=_shared_memory.buf)
+    init_worker(splitter, window_kwargs, jobs)
+
+
 def calculate_bounds(
-    geometry: STGeometry, window_size: int
-) -> tuple[int, int, int, int]:
-    """Calculate the bounds of a window around a geometry.
+    cols: np.ndarray, rows: np.ndarray, window_size: int
+) -> np.ndarray:
+    """Calculate the bounds of windows around points.
+
+    Vectorized over points from
+    https://github.com/allenai/rslearn_projects/blob/master/rslp/utils/windows.py
+    Pixel coordinates are truncated toward zero, and windows with an odd size
+    extend one pixel further right and up than left and down.
 
     Args:
-        geometry: the geometry to calculate the bounds of.
+        cols: the pixel column of each point.
+        rows: the pixel row of each point.
         window_size: the size of the window.
 
-    Copied from
-    https://github.com/allenai/rslearn_projects/blob/master/rslp/utils/windows.py
+    Returns:
+        an (N, 4) integer array with the bounds of each window.
     """
     if window_size <= 0:
         raise ValueError("Window size must be greater than 0")
 
-    if window_size % 2 == 0:
-        bounds = (
-            int(geometry.shp.x) - window_size // 2,
-            int(geometry.shp.y) - window_size // 2,
-            int(geometry.shp.x) + window_size // 2,
-            int(geometry.shp.y) + window_size // 2,
-        )
-    else:
-        bounds = (
-            int(geometry.shp.x) - window_size // 2,
-            int(geometry.shp.y) - window_size // 2 - 1,
-            int(geometry.shp.x) + window_size // 2 + 1,
-            int(geometry.shp.y) + window_size // 2,
-        )
-
-    return bounds
+    x0 = cols.astype(np.int64) - window_size // 2
+    y0 = rows.astype(np.int64) - window_size // 2 - window_size % 2
+    return np.stack([x0, y0, x0 + window_size, y0 + window_size], axis=1)
 
 
 def process_gpkg(gpkg_path: UPath, crop_type: bool) -> gpd.GeoDataFrame:
     """Load a GPKG and ensure lon/lat in WGS84; expect 'fid' and 'class' columns."""
-    gdf = gpd.read_file(str(gpkg_path))
+    # Only the label column and geometry are read. Missing columns are skipped
+    # by pyogrio, so they are still caught by the check below.
+    gdf = gpd.read_file(
+        str(gpkg_path),
+        engine="pyogrio",
+        use_arrow=USE_ARROW,
+        columns=["crop1" if crop_type else "class"],
+    )
 
     # Normalize CRS to WGS84
     if gdf.crs is None:
-        gdf = gdf.set_crs("EPSG:4326", allow_override=True)
-    else:
+        gdf.set_crs("EPSG:4326", allow_override=True, inplace=True)
+    elif gdf.crs.to_epsg() != 4326:
         gdf = gdf.to_crs("EPSG:4326")
 
     required_cols = {"crop1" if crop_type else "class", "geometry"}
@@ -129,33 +220,92 @@ def iter_points(
     gdf: gpd.GeoDataFrame, crop_type: bool
 ) -> Iterable[tuple[int, float, float, int | str]]:
     """Yield (fid, latitude, longitude, category) per feature using centroid for polygons."""
-    for fid, row in gdf.iterrows():
-        geom = row.geometry
-        if geom is None or geom.is_empty:
-            continue
-        if isinstance(geom, shapely.Point):
-            pt = geom
-        else:
-            pt = geom.centroid
-        lon, lat = float(pt.x), float(pt.y)
-        # the crop type labels are strings, the lulc labels are ints which
-        # map to classes
-        category = row["crop1"] if crop_type else int(row["class"])
-        yield fid, lat, lon, category
+    geoms = gdf.geometry.to_numpy()
+    gdf = gdf[~(shapely.is_missing(geoms) | shapely.is_empty(geoms))]
+    # The centroid of a point is the point itself, so one vectorized call covers
+    # both points and polygons.
+    points = shapely.centroid(gdf.geometry.to_numpy())
+    lons = shapely.get_x(points).tolist()
+    lats = shapely.get_y(points).tolist()
+    # the crop type labels are strings, the lulc labels are ints which
+    # map to classes
+    if crop_type:
+        categories = gdf["crop1"].tolist()
+    else:
+        categories = [int(category) for category in gdf["class"].tolist()]
+    yield from zip(gdf.index.tolist(), lats, lons, categories)
+
+
+@functools.cache
+def get_wgs84_transformer(epsg: int) -> pyproj.Transformer:
+    """Get a transformer from WGS84 longitude/latitude to the given EPSG code.
+
+    Building a transformer means a pyproj database lookup, so one is kept per
+    zone and reused across GPKG files.
+    """
+    return pyproj.Transformer.from_crs(4326, epsg, always_xy=True)
+
+
+@functools.cache
+def get_window_projection(epsg: int) -> Projection:
+    """Get the WINDOW_RESOLUTION projection for the given EPSG code.
+
+    Windows only read their projection, so the windows in a zone share one
+    instance rather than each parsing the CRS again.
+    """
+    return Projection(CRS.from_epsg(epsg), WINDOW_RESOLUTION, -WINDOW_RESOLUTION)
+
+
+def get_utm_ups_pixels(
+    lons: np.ndarray, lats: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Get the UTM/UPS zone and window pixel coordinates of WGS84 points.
+
+    This is a vectorized get_utm_ups_crs followed by projecting each point to
+    WINDOW_RESOLUTION: zones are computed arithmetically, with points on a zone
+    boundary going to the lower zone as in the pyproj database lookup, and the
+    points in each zone are transformed with a single pyproj call.
+
+    Args:
+        lons: longitudes in degrees.
+        lats: latitudes in degrees.
+
+    Returns:
+        a tuple (epsgs, cols, rows) of the EPSG code and pixel coordinates of each
+            point.
+    """
+    zones = np.clip(np.ceil((lons + 180) / 6), 1, 60).astype(int)
+    epsgs = np.where(lats >= 0, 32600, 32700) + zones
+    epsgs[lats > UPS_NORTH_THRESHOLD] = UPS_NORTH_EPSG
+    epsgs[lats < UPS_SOUTH_THRESHOLD] = UPS_SOUTH_EPSG
+
+    cols = np.empty(len(lons))
+    rows = np.empty(len(lons))
+    for epsg in np.unique(epsgs):
+        mask = epsgs == epsg
+        xs, ys = get_wgs84_transformer(int(epsg)).transform(lons[mask], lats[mask])
+        cols[mask] = xs / WINDOW_RESOLUTION
+        rows[mask] = ys / -WINDOW_RESOLUTION
+    return epsgs, cols, rows
 
 
 def create_window(
     rec: tuple[int, float, float, int | str],
+    epsg: int,
+    bounds: tuple[int, int, int, int],
     ds_path: UPath,
     group_name: str,
     split: str,
-    window_size: int,
     start_time: datetime,
     end_time: datetime,
     crop_type: bool,
-    splitter: DataSplitterInterface,
 ) -> None:
-    """Create a single window and write label layer."""
+    """Create a single window and write label layer.
+
+    The window has the given bounds in the UTM/UPS zone given by epsg, as computed
+    by get_utm_ups_pixels and calculate_bounds. Train windows are re-split with
+    the splitter set by init_worker.
+    """
     fid, latitude, longitude, category_id = rec
     if crop_type:
         if not isinstance(category_id, str):
@@ -168,12 +318,7 @@ def create_window(
         category_label = CLASS_MAP.get(category_id, f"Unknown_{category_id}")
 
     # Geometry/projection
-    src_point = shapely.Point(longitude, latitude)
-    src_geometry = STGeometry(WGS84_PROJECTION, src_point, None)
-    dst_crs = get_utm_ups_crs(longitude, latitude)
-    dst_projection = Projection(dst_crs, WINDOW_RESOLUTION, -WINDOW_RESOLUTION)
-    dst_geometry = src_geometry.to_projection(dst_projection)
-    bounds = calculate_bounds(dst_geometry, window_size)
+    dst_projection = get_window_projection(epsg)
 
     # Group = province name; split is taken from file name (train/test)
     group = group_name
@@ -196,7 +341,8 @@ def create_window(
     )
 
     if split == "train":
-        split = splitter.choose_split_for_window(window)
+        assert _splitter is not None, "init_worker must be called first"
+        split = _splitter.choose_split_for_window(window)
         window.options["split"] = split
     window.save()
 
@@ -211,10 +357,81 @@ def create_window(
         },
     )
     layer_dir = window.get_layer_dir(LABEL_LAYER)
-    GeojsonVectorFormat().encode_vector(layer_dir, [feature])
+    VECTOR_FORMAT.encode_vector(layer_dir, [feature])
     window.mark_layer_completed(LABEL_LAYER)
 
 
+def make_jobs(
+    records: list[tuple[int, float, float, int | str]],
+    epsgs: np.ndarray,
+    bounds: np.ndarray,
+    crop_type: bool,
+) -> np.ndarray:
+    """Pack the per-record create_window arguments into a structured array.
+
+    Args:
+        records: the (fid, latitude, longitude, category) records from iter_points.
+        epsgs: the EPSG code of each record, from get_utm_ups_pixels.
+        bounds: the window bounds of each record, from calculate_bounds.
+        crop_type: whether the categories are crop type names rather than LULC
+            class IDs.
+
+    Returns:
+        an array with fid, latitude, longitude, category, epsg and bounds fields.
+    """
+    if crop_type:
+        # Missing crop types would be packed as the strings "None" or "nan", past
+        # the check in create_window, so they are rejected before packing.
+        non_str = [rec[3] for rec in records if not isinstance(rec[3], str)]
+        if non_str:
+            raise ValueError(f"{non_str[0]} should be str in the crop-type case.")
+    categories = np.array(
+        [rec[3] for rec in records], dtype=str if crop_type else np.int64
+    )
+    jobs = np.empty(
+        len(records),
+        dtype=[
+            ("fid", np.int64),
+            ("latitude", np.float64),
+            ("longitude", np.float64),
+            ("category", categories.dtype),
+            ("epsg", np.int64),
+            ("bounds", np.int64, (4,)),
+        ],
+    )
+    jobs["fid"] = [rec[0] for rec in records]
+    jobs["latitude"] = [rec[1] for rec in records]
+    jobs["longitude"] = [rec[2] for rec in records]
+    jobs["category"] = categories
+    jobs["epsg"] = epsgs
+    jobs["bounds"] = bounds
+    return jobs
+
+
+def create_windows_for_range(job_range: tuple[int, int]) -> int:
+    """Create the windows for a range of rows of the jobs array.
+
+    The jobs array and the remaining create_window arguments are the ones set by
+    init_worker.
+
+    Args:
+        job_range: the (start, stop) rows to create windows for.
+
+    Returns:
+        the number of windows created.
+    """
+    assert _jobs is not None, "init_worker must be called first"
+    start, stop = job_range
+    for fid, latitude, longitude, category, epsg, bounds in _jobs[start:stop].tolist():
+        create_window(
+            (fid, latitude, longitude, category),
+            epsg,
+            tuple(bounds.tolist()),
+            **_window_kwargs,
+        )
+    return stop - start
+
+
 def create_windows_from_gpkg(
     gpkg_path: UPath,
     ds_path: UPath,
@@ -229,25 +446,26 @@ def create_windows_from_gpkg(
     """Create windows from a single GPKG file."""
     gdf = process_gpkg(gpkg_path, crop_type)
     records = list(iter_points(gdf, crop_type))
+    epsgs, cols, rows = get_utm_ups_pixels(
+        np.array([rec[2] for rec in records], dtype=np.float64),
+        np.array([rec[1] for rec in records], dtype=np.float64),
+    )
+    jobs = make_jobs(
+        records, epsgs, calculate_bounds(cols, rows, window_size), crop_type
+    )
 
     splitter = SpatialDataSplitter(
         train_prop=0.9, val_prop=0.1, test_prop=0.0, grid_size=32
     )
 
-    jobs = [
-        dict(
-            rec=rec,
-            ds_path=ds_path,
-            group_name=group_name,
-            split=split,
-            window_size=window_size,
-            start_time=start_time,
-            end_time=end_time,
-            crop_type=crop_type,
-            splitter=splitter,
-        )
-        for rec in records
-    ]
+    window_kwargs = {
+        "ds_path": ds_path,
+        "group_name": group_name,
+        "split": split,
+        "start_time": start_time,
+        "end_time": end_time,
+        "crop_type": crop_type,
+    }
 
     print(
         f"[{group_name}:{split}] file={gpkg_path.name} features={len(jobs)} "
@@ -255,14 +473,37 @@ def create_windows_from_gpkg(
     )
 
     if max_workers <= 1:
-        for kw in tqdm.tqdm(jobs):
-            create_window(**kw)
-    else:
-        p = multiprocessing.Pool(max_workers)
-        outputs = star_imap_unordered(p, create_window, jobs)
-        for _ in tqdm.tqdm(outputs, total=len(jobs)):
-            pass
-        p.close()
+        init_worker(splitter, window_kwargs, jobs)
+        for idx in tqdm.tqdm(range(len(jobs))):
+            create_windows_for_range((idx, idx + 1))
+        return
+
+    chunksize = max(1, len(jobs) // (max_workers * CHUNKS_PER_WORKER))
+    job_ranges = [
+        (start, min(start + chunksize, len(jobs)))
+        for start in range(0, len(jobs), chunksize)
+    ]
+    shared_memory = SharedMemory(create=True, size=max(1, jobs.nbytes))
+    try:
+        np.ndarray(len(jobs), dtype=jobs.dtype, buffer=shared_memory.buf)[:] = jobs
+        with multiprocessing.Pool(
+            max_workers,
+            initializer=init_shared_worker,
+            initargs=(
+                splitter,
+                window_kwargs,
+                shared_memory.name,
+                jobs.dtype,
+                len(jobs),
+            ),
+        ) as p:
+            outputs = p.imap_unordered(create_windows_for_range, job_ranges)
+            with tqdm.tqdm(total=len(jobs)) as progress:
+                for count in outputs:
+                    progress.update(count)
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 """Count how many classes are in each split."""
 
 import argparse
+from collections import Counter
 
 from rslearn.dataset.dataset import Dataset
 from upath import UPath
@@ -13,18 +14,24 @@ if __name__ == "__main__":
         required=True,
         help="Path to the dataset",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=64,
+        help="Number of worker processes to use for loading windows",
+    )
     args = parser.parse_args()
 
     dataset = Dataset(UPath(args.ds_path))
-    windows = dataset.load_windows(show_progress=True)
+    windows = dataset.load_windows(workers=args.workers, show_progress=True)
+    counts = Counter(
+        (window.options["category"], window.options["split"]) for window in windows
+    )
     output_dict: dict[str, dict[str, int]] = {}
-    for window in windows:
-        split = window.options["split"]
-        category = window.options["category"]
-
+    for (category, split), count in counts.items():
         if category not in output_dict:
             output_dict[category] = {"train": 0, "val": 0, "test": 0}
 
-        output_dict[category][split] += 1
+        output_dict[category][split] = count
 
     print(output_dict)
@@ -2,6 +2,9 @@
 
 import argparse
 import multiprocessing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
 
 import tqdm
 from olmoearth_run.runner.tools.data_splitters.data_splitter_interface import (
@@ -15,17 +18,79 @@ from olmoearth_run.runner.tools.data_splitters.spatial_data_splitter import (
 )
 from rslearn.dataset.dataset import Dataset
 from rslearn.dataset.window import Window
-from rslearn.utils.mp import star_imap_unordered
 from upath import UPath
 
+# Each process saves windows from this many threads, so that writes to remote
+# storage overlap instead of each waiting out a full round trip in turn.
+SAVE_THREADS = 8
 
-def update_train_val_split(window: Window, splitter: DataSplitterInterface) -> None:
-    """Create label raster for the given window."""
-    if window.options["split"] in ["train", "val"]:
+# Windows are sent to the workers in batches of at most this many.
+MAX_BATCH_SIZE = 256
+
+
+def update_train_val_split(
+    window: Window, splitter: DataSplitterInterface
+) -> tuple[str, str] | None:
+    """Re-split the given window in memory if it is in the train or val split.
+
+    The window is not saved, see update_train_val_splits.
+
+    Returns:
+        the (old, new) split of the window, or None if it was not re-split.
+    """
+    old_split = window.options["split"]
+    if old_split in ["train", "val"]:
         split = splitter.choose_split_for_window(window)
-        print(f"Window was {window.options['split']}, changing to {split}")
         window.options["split"] = split
-        window.save()
+        return old_split, split
+    return None
+
+
+def update_train_val_splits(
+    windows: list[Window], splitter: DataSplitterInterface
+) -> list[tuple[str, str] | None]:
+    """Re-split the given windows and save the ones that were re-split.
+
+    Splits are chosen serially, since the splitter need not be thread-safe, and
+    only the saves are spread over SAVE_THREADS threads. All saves have finished
+    when this returns.
+
+    Returns:
+        the split change of each window, see update_train_val_split.
+    """
+    changes = [update_train_val_split(window, splitter) for window in windows]
+    resplit = [window for window, change in zip(windows, changes) if change is not None]
+    with ThreadPoolExecutor(max_workers=SAVE_THREADS) as executor:
+        # Consuming the results re-raises the first failed save.
+        list(executor.map(Window.save, resplit))
+    return changes
+
+
+# The splitter, set once per process by init_worker rather than being pickled
+# with every window.
+_splitter: DataSplitterInterface | None = None
+
+
+def init_worker(splitter: DataSplitterInterface) -> None:
+    """Set the splitter that update_train_val_splits_from_metadata uses."""
+    global _splitter
+    _splitter = splitter
+
+
+def update_train_val_splits_from_metadata(
+    paths_and_metadata: list[tuple[UPath, dict[str, Any]]],
+) -> list[tuple[str, str] | None]:
+    """Update the splits of a batch of windows given their paths and metadata.
+
+    Windows loaded from a dataset index hold a reference to the whole index, so
+    workers are sent just the path and metadata of each window, from which
+    Window.from_metadata rebuilds it, and use the splitter set by init_worker.
+    """
+    assert _splitter is not None, "init_worker must be called first"
+    windows = [
+        Window.from_metadata(path, metadata) for path, metadata in paths_and_metadata
+    ]
+    return update_train_val_splits(windows, _splitter)
 
 
 if __name__ == "__main__":
@@ -73,13 +138,33 @@ if __name__ == "__main__":
         workers=args.workers, show_progress=True, groups=groups
     )
 
+    # Windows are handled in batches, so that each worker has many saves to
+    # overlap and the per-task IPC overhead is amortized over many windows.
+    batch_size = len(windows) // (max(1, args.workers) * 4)
+    batch_size = max(1, min(MAX_BATCH_SIZE, batch_size))
+    batches = [windows[i : i + batch_size] for i in range(0, len(windows), batch_size)]
+
+    # Split changes are tallied and summarized at the end rather than printed by
+    # every worker for every window.
+    changes: Counter[tuple[str, str]] = Counter()
     if args.workers <= 1:
-        for window in tqdm.tqdm(windows):
-            update_train_val_split(window, splitter)
+        for batch in tqdm.tqdm(batches):
+            for change in update_train_val_splits(batch, splitter):
+                if change is not None:
+                    changes[change] += 1
     else:
-        jobs = [dict(splitter=splitter, window=w) for w in windows]
-        p = multiprocessing.Pool(args.workers)
-        outputs = star_imap_unordered(p, update_train_val_split, jobs)
-        for _ in tqdm.tqdm(outputs, total=len(jobs)):
-            pass
-        p.close()
+        with multiprocessing.Pool(
+            args.workers, initializer=init_worker, initargs=(splitter,)
+        ) as p:
+            tasks = [
+                [(window.path, window.get_metadata()) for window in batch]
+                for batch in batches
+            ]
+            outputs = p.imap_unordered(update_train_val_splits_from_metadata, tasks)
+            for batch_changes in tqdm.tqdm(outputs, total=len(tasks)):
+                for change in batch_changes:
+                    if change is not None:
+                        changes[change] += 1
+
+    for (old_split, split), count in sorted(changes.items()):
+        print(f"{count} windows were {old_split}, changed to {split}")
@@ -3,28 +3,47 @@
 import geopandas as gpd
 import numpy as np
 import pandas as pd
-import torch
-from scipy.stats import mode
+import shapely
+from scipy.spatial import KDTree
 
 
-def relative_haversine(
-    latlons_1: torch.Tensor, latlons_2: torch.Tensor
-) -> torch.Tensor:
-    """Calculate the great circle distance between two points on the earth.
+def _knn_indices(features: np.ndarray, k: int) -> np.ndarray:
+    """Find the k nearest neighbours of every row of features.
 
-    Latlons must be specified in radians.
+    Returns:
+        an (N, k) array with the indices of each row's neighbours, nearest first.
     """
-    dlon = latlons_2[:, 1] - latlons_1[:, 1]
-    dlat = latlons_2[:, 0] - latlons_1[:, 0]
-
-    a = (
-        torch.sin(dlat / 2.0) ** 2
-        + torch.cos(latlons_1[:, 0])
-        * torch.cos(latlons_2[:, 0])
-        * torch.sin(dlon / 2.0) ** 2
+    # The queries are independent, so they are spread over all CPU cores.
+    _, top_k_indices = KDTree(features).query(features, k=k + 1, workers=-1)
+    # Each row is its own nearest neighbour, but exact duplicates are all at
+    # distance 0, so the row itself need not come first. Drop it wherever it is,
+    # or drop the farthest neighbour when duplicates crowded the row out.
+    is_self = top_k_indices == np.arange(len(top_k_indices))[:, None]
+    is_self[~is_self.any(axis=1), -1] = True
+    return top_k_indices[~is_self].reshape(len(top_k_indices), k)
+
+
+def _classify_vote(
+    labels: np.ndarray, num_classes: int, top_k_indices: np.ndarray
+) -> np.ndarray:
+    """Predict each label as the majority label of its neighbours.
+
+    Majority vote over the neighbours by counting each label per row. Labels are
+    shifted up by one to count the -1 that factorize gives missing labels, and
+    argmax takes the smallest label on ties, as scipy's mode does.
+    """
+    num_rows, num_counts = len(labels), num_classes + 1
+    row_offsets = np.arange(num_rows)[:, None] * num_counts
+    counts = np.bincount(
+        (row_offsets + labels[top_k_indices] + 1).ravel(),
+        minlength=num_rows * num_counts,
     )
+    return counts.reshape(num_rows, num_counts).argmax(axis=1) - 1
 
-    return torch.arcsin(torch.sqrt(a))
+
+def _regress_mean(labels: np.ndarray, top_k_indices: np.ndarray) -> np.ndarray:
+    """Predict each label as the mean label of its neighbours."""
+    return labels[top_k_indices].mean(axis=1)
 
 
 def spatial_clustering(df: gpd.GeoDataFrame, k: int = 5) -> dict[str | int, float]:
@@ -39,51 +58,44 @@ def spatial_clustering(df: gpd.GeoDataFrame, k: int = 5) -> dict[str | int, floa
     """
     labels = df["label"].values
     # latitude , longitude = [y, x]
-    features = torch.stack(
-        [
-            torch.from_numpy(np.radians(df.geometry.centroid.y.values)),
-            torch.from_numpy(np.radians(df.geometry.centroid.x.values)),
-        ],
-        dim=-1,
+    centroids = df.geometry.centroid.to_numpy()
+    lats = np.radians(shapely.get_y(centroids))
+    lons = np.radians(shapely.get_x(centroids))
+    # The centroids as points on the unit sphere. The straight-line distance
+    # between two of them increases monotonically with their great circle
+    # distance, so a KD-tree over these finds the great circle nearest neighbours.
+    features = np.stack(
+        [np.cos(lats) * np.cos(lons), np.cos(lats) * np.sin(lons), np.sin(lats)],
+        axis=-1,
     )
+    top_k_indices = _knn_indices(features, k)
+
     # if labels are floats, then its a regression. If labels are ints or strings,
     # its classification
-    regression = True
     if (type(labels[0]) is str) or (labels.astype(int) == labels).all():
         regression = False
         labels, unique = pd.factorize(labels)
+        all_preds_np = _classify_vote(labels, len(unique), top_k_indices)
+    else:
+        regression = True
+        all_preds_np = _regress_mean(labels, top_k_indices)
 
-    all_preds = []
-    for i in range(features.shape[0]):
-        test_feature = features[i].unsqueeze(dim=0).repeat(features.shape[0], 1)
-        distances = relative_haversine(features, test_feature)
-        # we skip the first index, which should be where test_feature == train_feature
-        top_k_indices = (
-            torch.topk(distances, k=k + 1, largest=False).indices[1:].numpy()
-        )
-
-        if not regression:
-            all_preds.append(mode(labels[top_k_indices])[0])
-        else:
-            all_preds.append(labels[top_k_indices].mean())
-    all_preds_np = np.array(all_preds)
     if regression:
         # MSE error
 
-        return {"regression_mse": sum((labels - all_preds_np) ** 2) / len(labels)}
+        return {"regression_mse": np.mean((labels - all_preds_np) ** 2)}
     else:
         output_dict: dict[str | int, float] = {}
         # f1 score
         for label_idx, label_value in enumerate(unique):
             cat_labels = labels == label_idx
             cat_preds = all_preds_np == label_idx
-            if sum(cat_preds) == 0:
+            if not cat_preds.any():
                 # no instances received this value as a prediction
                 output_dict[f"{label_value}_f1"] = 0
             else:
-                positives = cat_labels == 1
-                tp = sum(cat_labels[positives] == cat_preds[positives])
-                recall = tp / sum(cat_labels)
-                precision = tp / sum(cat_preds)
+                tp = (cat_labels & cat_preds).sum()
+                recall = tp / cat_labels.sum()
+                precision = tp / cat_preds.sum()
                 output_dict[f"{label_value}_f1"] = 2 / ((1 / recall) + (1 / precision))
         return output_dict
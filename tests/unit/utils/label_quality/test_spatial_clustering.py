@@ -48,3 +48,20 @@ def test_spatial_clustering_regression() -> None:
     # now we reduce the spatial clustering, so MSE goes up
     gdf.label = [1.5, 0.5, 2.5, 0.5, 1.5]
     assert spatial_clustering(gdf[["label", "geometry"]], k=1)["regression_mse"] == 1
+
+
+def test_spatial_clustering_duplicate_coordinates() -> None:
+    # pairs of labels at exactly the same location, so each label's only
+    # neighbour at k=1 is the other label of its pair
+    latitudes = [-34.58, -15.78, -33.45, 4.60, 10.48]
+    longitudes = [-58.66, -47.91, -70.66, -74.08, -66.86]
+    gdf = gpd.GeoDataFrame(
+        {"label": [0.5, 1.5] * len(latitudes)},
+        geometry=gpd.points_from_xy(
+            [lon for lon in longitudes for _ in range(2)],
+            [lat for lat in latitudes for _ in range(2)],
+        ),
+        crs="EPSG:4326",
+    )
+    # a label leaking into its own prediction would give an MSE below 1
+    assert spatial_clustering(gdf[["label", "geometry"]], k=1)["regression_mse"] == 1